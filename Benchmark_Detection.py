@@ -0,0 +1,415 @@
+import argparse
+import json
+import multiprocessing
+import os
+import platform
+import subprocess
+import sys
+import time
+import tracemalloc
+from typing import Dict, List, Optional, Tuple
+import cv2
+import numpy as np
+from Detection_Backend import letterbox
+from Detection_Pipeline import DetectionPipeline, MotionGate
+
+
+def load_frames(path: str, count: int) -> List[np.ndarray]:
+    '''
+    벤치마크 입력 프레임을 모델 입력 크기(BGR24)로 디코딩해서 반환.
+    - VideoReceiver 캡처 파일(.tcap)이나 raw H.264 파일은 Benchmark_Video와 같은 방식으로 access unit을 나눠서 디코딩.
+    - 그 밖의 파일(mkv/mp4 등, 아카이브/클립 파일)은 PyAV로 바로 엶.
+    '''
+    import av
+    width, height = DetectionPipeline.INPUT_SIZE
+    frames: List[np.ndarray] = []
+    if path.endswith((".tcap", ".h264", ".264")):
+        from Benchmark_Video import load_datagrams, split_access_units
+        codec = av.CodecContext.create("h264", "r")
+        decoded = (frame for access_unit in split_access_units(load_datagrams(path)) for frame in codec.decode(av.Packet(access_unit)))
+    else:
+        container = av.open(path)
+        decoded = container.decode(video=0)
+    for frame in decoded:
+        frames.append(frame.reformat(width=width, height=height, format="bgr24", interpolation="BICUBIC").to_ndarray())
+        if len(frames) >= count:
+            break
+    return frames
+
+
+def synthetic_frames(count: int, seed: int = 0) -> List[np.ndarray]:
+    # 녹화 영상이 없을 때 쓰는 고정 합성 프레임 (그라데이션 배경 + 움직이는 사각형). seed가 같으면 어느 PC에서나 같은 프레임
+    rng = np.random.default_rng(seed)
+    width, height = DetectionPipeline.INPUT_SIZE
+    gradient = np.linspace(40, 200, width, dtype=np.float32)[None, :] + np.linspace(0, 40, height, dtype=np.float32)[:, None]
+    background = np.repeat(gradient[:, :, None], 3, axis=2) + rng.normal(0, 6, (height, width, 3))
+    background = background.clip(0, 255).astype(np.uint8)
+    objects = [(rng.uniform(0, width), rng.uniform(0, height), rng.uniform(-4, 4), rng.uniform(-3, 3),
+                int(rng.integers(30, 90)), int(rng.integers(60, 180)), tuple(int(c) for c in rng.integers(0, 255, 3))) for _ in range(4)]
+    frames = []
+    for i in range(count):
+        frame = background.copy()
+        for x, y, vx, vy, w, h, color in objects:
+            left, top = int(x + vx * i) % width, int(y + vy * i) % height
+            cv2.rectangle(frame, (left, top), (left + w, top + h), color, -1)
+        frames.append(frame)
+    return frames
+
+
+def drone_frames(frames: List[np.ndarray], drones: int, tick: int) -> List[np.ndarray]:
+    # 드론 N대를 흉내냄: 드론마다 같은 영상의 다른 위치를 보도록 시작점을 어긋나게 함
+    offset = len(frames) // max(drones, 1)
+    return [frames[(tick + i * offset) % len(frames)] for i in range(drones)]
+
+
+def bench_single(detector, frames: List[np.ndarray], drones: int, ticks: int) -> Dict:
+    # 기존 방식: 드론마다 추론을 한 번씩 호출
+    ips = [f"drone{i}" for i in range(drones)]
+    cpu_start = time.process_time()
+    wall_start = time.perf_counter()
+    for tick in range(ticks):
+        for ip, frame in zip(ips, drone_frames(frames, drones, tick)):
+            detector.predict_image(frame, ip)
+    return summarize(drones * ticks, time.perf_counter() - wall_start, time.process_time() - cpu_start)
+
+
+def bench_batched(detector, frames: List[np.ndarray], drones: int, ticks: int) -> Dict:
+    # 새 방식: 매 틱마다 모든 드론의 프레임을 predict_batch 한 번으로 추론
+    ips = [f"drone{i}" for i in range(drones)]
+    cpu_start = time.process_time()
+    wall_start = time.perf_counter()
+    for tick in range(ticks):
+        detector.predict_batch(drone_frames(frames, drones, tick), ips)
+    return summarize(drones * ticks, time.perf_counter() - wall_start, time.process_time() - cpu_start)
+
+
+def summarize(frames: int, wall: float, cpu: float) -> Dict:
+    return {
+        'frames': frames,
+        'fps': frames / wall if wall else 0.0,
+        'fps_per_core': frames / cpu if cpu else 0.0, # CPU 1코어를 온전히 썼을 때 처리할 수 있는 프레임 수 (GPU 추론이면 호스트 측 부담)
+        'ms_per_frame': wall / max(frames, 1) * 1000.0,
+    }
+
+
+def match_detections(reference: np.ndarray, candidate: np.ndarray, iou_threshold: float = 0.5) -> int:
+    # 같은 클래스끼리 IoU가 iou_threshold 이상인 박스 쌍의 수 (점수 높은 기준 박스부터 탐욕적으로 짝지음)
+    matched = 0
+    used = np.zeros(len(candidate), dtype=bool)
+    for box in reference[np.argsort(-reference[:, 4])] if len(reference) else []:
+        if not len(candidate):
+            break
+        w = (np.minimum(box[2], candidate[:, 2]) - np.maximum(box[0], candidate[:, 0])).clip(0)
+        h = (np.minimum(box[3], candidate[:, 3]) - np.maximum(box[1], candidate[:, 1])).clip(0)
+        inter = w * h
+        union = (box[2] - box[0]) * (box[3] - box[1]) + (candidate[:, 2] - candidate[:, 0]) * (candidate[:, 3] - candidate[:, 1]) - inter
+        iou = np.where(used | (candidate[:, 5] != box[5]), 0.0, inter / np.maximum(union, 1e-9))
+        best = int(iou.argmax())
+        if iou[best] >= iou_threshold:
+            used[best] = True
+            matched += 1
+    return matched
+
+
+def bench_gate(detector, frames: List[np.ndarray], thresholds: List[float], max_skip: int) -> List[Dict]:
+    '''
+    장면 변화 필터(MotionGate)의 건너뛰기 비율과 정확도 영향을 잼.
+    - 모든 프레임을 추론한 결과를 기준으로, 필터를 켰을 때(건너뛴 프레임은 이전 결과 재사용) 같은 박스가 나오는지 비교.
+    - recall: 기준 박스 중 필터 결과에도 있는 비율, precision: 필터 결과 박스 중 기준에도 있는 비율
+    '''
+    reference = [detector.backend.predict([frame])[0] for frame in frames]
+    results = []
+    for threshold in thresholds:
+        gate = MotionGate(threshold, max_skip=max_skip)
+        last = np.zeros((0, 6), dtype=np.float32)
+        matched = reference_boxes = gated_boxes = 0
+        gate_time = 0.0
+        for frame, detections in zip(frames, reference):
+            start = time.perf_counter()
+            if gate.should_infer("drone0", frame):
+                last = detections
+            gate_time += time.perf_counter() - start
+            matched += match_detections(detections, last)
+            reference_boxes += len(detections)
+            gated_boxes += len(last)
+        results.append({
+            'threshold': threshold,
+            'skip_ratio': gate.skip_ratio("drone0"),
+            'recall': matched / reference_boxes if reference_boxes else 1.0,
+            'precision': matched / gated_boxes if gated_boxes else 1.0,
+            'gate_ms_per_frame': gate_time / max(len(frames), 1) * 1000,
+        })
+    return results
+
+
+def legacy_preprocess(images: List[np.ndarray], imgsz, dtype) -> np.ndarray:
+    # 기존 방식: 프레임마다 letterbox 이미지(resize + copyMakeBorder)와 입력 텐서를 새로 할당하고, 정규화도 따로 한 번 더 훑음
+    batch = np.empty((len(images), 3, imgsz[0], imgsz[1]), dtype=dtype)
+    for i, image in enumerate(images):
+        boxed, _, _ = letterbox(image, imgsz)
+        batch[i] = boxed[:, :, ::-1].transpose(2, 0, 1)
+    batch *= 1.0 / 255.0
+    return batch
+
+
+def bench_preprocess(backend, frames: List[np.ndarray], drones: int, ticks: int) -> Dict[str, Dict]:
+    '''
+    전처리(letterbox + 정규화) 한 번에 새로 할당되는 메모리와 시간을 기존 방식과 미리 할당한 버퍼(InputBuffers) 방식으로 비교.
+    - alloc_kb_per_frame: 틱마다 tracemalloc peak가 시작 시점보다 늘어난 양 / 드론 수 (프레임마다 잡았다 버리는 임시 배열 크기)
+    - max_abs_diff: 두 방식의 입력 텐서 차이 (0이어야 함)
+    '''
+    ips = [f"drone{i}" for i in range(drones)]
+    methods = {
+        'legacy': lambda images: legacy_preprocess(images, backend.imgsz, backend.input_dtype),
+        'preallocated': lambda images: backend.preprocess(images, ips)[0],
+    }
+    results = {}
+    for name, func in methods.items():
+        func(drone_frames(frames, drones, 0)) # 버퍼를 미리 잡아둠 (첫 호출의 할당은 빼고 잼)
+        tracemalloc.start()
+        allocated = 0
+        for tick in range(ticks):
+            images = drone_frames(frames, drones, tick)
+            tracemalloc.reset_peak()
+            before = tracemalloc.get_traced_memory()[0]
+            func(images)
+            allocated += tracemalloc.get_traced_memory()[1] - before
+        tracemalloc.stop()
+        start = time.perf_counter()
+        for tick in range(ticks):
+            func(drone_frames(frames, drones, tick))
+        results[name] = {
+            'alloc_kb_per_frame': allocated / (ticks * drones) / 1024,
+            'ms_per_frame': (time.perf_counter() - start) / (ticks * drones) * 1000,
+        }
+    images = drone_frames(frames, drones, 0)
+    diff = np.abs(methods['legacy'](images).astype(np.float32) - methods['preallocated'](images).astype(np.float32)).max()
+    results['preallocated']['max_abs_diff'] = float(diff)
+    return results
+
+
+def peak_rss_mb() -> Optional[float]:
+    # 이 프로세스의 최대 RSS (MB). resource가 없는 Windows는 psutil이 설치된 경우에만 잼
+    try:
+        import resource
+    except ImportError:
+        try:
+            import psutil
+        except ImportError:
+            return None
+        return psutil.Process().memory_info().peak_wset / (1 << 20)
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss # Linux는 KB, macOS는 바이트
+    return peak / (1 << 20) if sys.platform == "darwin" else peak / 1024
+
+
+def stage_summary(samples: List[float]) -> Dict:
+    # 단계별 시간(초) 목록 → 평균, 중앙값, p95 (ms)
+    samples = sorted(samples)
+    return {
+        'mean_ms': sum(samples) / len(samples) * 1000,
+        'p50_ms': samples[len(samples) // 2] * 1000,
+        'p95_ms': samples[min(int(len(samples) * 0.95), len(samples) - 1)] * 1000,
+    }
+
+
+def bench_config(config: Dict) -> Dict:
+    '''
+    설정 하나(백엔드, 입력 해상도, 배치 크기)를 측정. run_suite가 설정마다 새 프로세스에서 부르므로 peak RSS가 다른 설정과 섞이지 않음.
+    - 단계별 지연: preprocess/inference/postprocess는 백엔드가 잰 배치 시간, tracking은 update_session 시간. 모두 프레임당 ms로 나눔
+    - detector_fps: YoloImageDetector로 추론 + 추적만 했을 때, pipeline_fps: DetectionPipeline.process_batch 전체
+      (장면 변화 필터는 꺼서 모든 프레임을 추론함)
+    '''
+    from Detection_Model import YoloImageDetector
+    if config['stream']:
+        frames = load_frames(config['stream'], config['frames'])
+    else:
+        frames = synthetic_frames(config['frames'], config['seed'])
+    detector = YoloImageDetector(config['model'], config['backend'], config['device'], config['precision'], imgsz=config['imgsz'])
+    batch, ticks = config['batch'], config['ticks']
+    ips = [f"drone{i}" for i in range(batch)]
+    startup = detector.warmup(frames[0].shape, (batch,), runs=config['warmup'])
+
+    stages: Dict[str, List[float]] = {'preprocess': [], 'inference': [], 'postprocess': [], 'tracking': []}
+    start = time.perf_counter()
+    for tick in range(ticks):
+        results = detector.detect(drone_frames(frames, batch, tick), ips)
+        timings = detector.backend.last_timings
+        tracking = time.perf_counter()
+        for ip, detections in zip(ips, results):
+            detector.update_session(ip, detections)
+        stages['tracking'].append(time.perf_counter() - tracking)
+        for stage, elapsed in timings.items():
+            stages[stage].append(elapsed)
+    detector_wall = time.perf_counter() - start
+
+    pipeline = DetectionPipeline(None, ips, motion_gate=MotionGate(-1.0), detector=detector)
+    start = time.perf_counter()
+    for tick in range(ticks):
+        pipeline.process_batch(drone_frames(frames, batch, tick), ips, [time.time()] * batch)
+    pipeline_wall = time.perf_counter() - start
+
+    backend = detector.backend
+    return {
+        'backend': backend.name,
+        'device': str(backend.device),
+        'precision': backend.precision,
+        'resolution': list(getattr(backend, 'imgsz', config['imgsz']) or []), # [height, width], 비어 있으면 모델에 저장된 크기
+        'batch': batch,
+        'load_ms': startup['load_ms'],
+        'cold_ms': startup[f'cold_ms_batch{batch}'],
+        'warm_ms': startup[f'warm_ms_batch{batch}'],
+        'stages': {stage: stage_summary([elapsed / batch for elapsed in samples]) for stage, samples in stages.items() if samples},
+        'detector_fps': batch * ticks / detector_wall,
+        'pipeline_fps': batch * ticks / pipeline_wall,
+        'peak_rss_mb': peak_rss_mb(),
+    }
+
+
+def parse_resolution(text: str) -> Optional[Tuple[int, int]]:
+    # "640x384" (width x height) → (384, 640) (height, width), "default"면 None
+    if text == "default":
+        return None
+    width, height = text.lower().split("x")
+    return int(height), int(width)
+
+
+def suite_metadata(args) -> Dict:
+    # 결과 파일을 커밋끼리 비교할 때 필요한 실행 환경 (커밋하지 않은 변경이 있으면 commit 뒤에 -dirty)
+    try:
+        commit = subprocess.run(["git", "describe", "--always", "--dirty"], capture_output=True, text=True,
+                                cwd=os.path.dirname(os.path.abspath(__file__))).stdout.strip() or None
+    except OSError:
+        commit = None
+    return {
+        'commit': commit,
+        'time': time.strftime("%Y-%m-%dT%H:%M:%S"),
+        'platform': platform.platform(),
+        'processor': platform.processor(),
+        'python': platform.python_version(),
+        'cpu_count': os.cpu_count(),
+        'model': args.model,
+        'corpus': args.stream or f"synthetic(seed={args.seed})",
+        'frames': args.frames,
+        'ticks': args.ticks,
+    }
+
+
+def run_suite(args) -> Dict:
+    # 백엔드 × 해상도 × 배치 크기 조합마다 새 프로세스(spawn)에서 bench_config를 돌림. 실패한 조합은 알리고 건너뜀
+    context = multiprocessing.get_context("spawn")
+    results = []
+    for backend in args.backends:
+        for resolution in args.resolutions:
+            for batch in args.batch_sizes:
+                config = {'stream': args.stream, 'frames': args.frames, 'seed': args.seed, 'model': args.model, 'backend': backend,
+                          'device': args.device, 'precision': args.precision, 'imgsz': parse_resolution(resolution),
+                          'batch': batch, 'ticks': args.ticks, 'warmup': args.warmup}
+                with context.Pool(1) as pool:
+                    try:
+                        result = pool.apply(bench_config, (config,))
+                    except Exception as e:
+                        print(f"[Benchmark] {backend} {resolution} batch={batch} failed: {e}")
+                        continue
+                results.append(result)
+                print(format_result(result))
+    return {'meta': suite_metadata(args), 'results': results}
+
+
+def format_result(result: Dict) -> str:
+    stages = "  ".join(f"{stage} {summary['p50_ms']:.2f}/{summary['p95_ms']:.2f}" for stage, summary in result['stages'].items())
+    rss = f"{result['peak_rss_mb']:.0f} MB" if result['peak_rss_mb'] is not None else "n/a"
+    return (f"{result['backend']:>11} {result['precision']:>4} {'x'.join(map(str, result['resolution'][::-1])) or 'default':>8} "
+            f"batch={result['batch']}: detector {result['detector_fps']:6.1f} fps  pipeline {result['pipeline_fps']:6.1f} fps  "
+            f"peak RSS {rss}  [p50/p95 ms/frame] {stages}")
+
+
+def compare_suites(baseline: Dict, current: Dict, tolerance: float = 0.1) -> List[str]:
+    # 같은 설정(백엔드, 정밀도, 해상도, 배치)끼리 처리량과 단계별 p50을 비교. tolerance 이상 나빠진 항목에는 REGRESSION 표시
+    def key(result: Dict) -> Tuple:
+        return result['backend'], result['precision'], tuple(result['resolution']), result['batch']
+
+    previous = {key(result): result for result in baseline['results']}
+    lines = []
+    for result in current['results']:
+        old = previous.get(key(result))
+        if old is None:
+            continue
+        name = f"{result['backend']} {result['precision']} {'x'.join(map(str, result['resolution'][::-1]))} batch={result['batch']}"
+        metrics = [(metric, old[metric], result[metric], True) for metric in ('detector_fps', 'pipeline_fps')]
+        metrics += [(f"{stage}_p50_ms", old['stages'][stage]['p50_ms'], summary['p50_ms'], False)
+                    for stage, summary in result['stages'].items() if stage in old['stages']]
+        for metric, before, after, higher_is_better in metrics:
+            change = (after - before) / before if before else 0.0
+            worse = -change if higher_is_better else change
+            lines.append(f"{name} {metric}: {before:.2f} -> {after:.2f} ({change * 100:+.1f}%)" + ("  REGRESSION" if worse > tolerance else ""))
+    return lines
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="드론 여러 대 YOLO 추론: 단일 프레임 vs 배치 비교")
+    parser.add_argument("stream", nargs="?", help="캡처 파일(.tcap), raw H.264 또는 mkv/mp4 파일 (suite 모드에서 생략하면 합성 프레임)")
+    parser.add_argument("--model", default="rand2.pt")
+    parser.add_argument("--drones", type=int, nargs="+", default=[1, 2, 3], help="흉내낼 드론 수 (여러 개 지정 가능)")
+    parser.add_argument("--ticks", type=int, default=100, help="드론마다 처리할 프레임 수")
+    parser.add_argument("--frames", type=int, default=300, help="디코딩해서 돌려쓸 입력 프레임 수")
+    parser.add_argument("--backend", default="auto", choices=("auto", "ultralytics", "onnxruntime", "openvino"))
+    parser.add_argument("--device", default="auto", help="예: 0, cpu, CPU, GPU (기본은 하드웨어를 보고 자동 선택)")
+    parser.add_argument("--precision", default="auto", choices=("auto", "fp32", "fp16", "int8"))
+    parser.add_argument("--warmup", type=int, default=5)
+    parser.add_argument("--mode", choices=("batch", "gate", "alloc", "suite"), default="batch",
+                        help="batch: 단일 프레임 vs 배치 추론 비교, gate: 장면 변화 필터의 건너뛰기 비율과 정확도 영향, "
+                             "alloc: 전처리의 프레임당 메모리 할당 (기존 vs 미리 할당한 버퍼), "
+                             "suite: 백엔드/해상도/배치 크기별 단계 지연, 처리량, peak RSS를 JSON으로 저장")
+    parser.add_argument("--thresholds", type=float, nargs="+", default=[2.0, 4.0, 8.0], help="gate 모드에서 비교할 MotionGate 임계값")
+    parser.add_argument("--max-skip", type=int, default=15)
+    parser.add_argument("--backends", nargs="+", default=["auto"], choices=("auto", "ultralytics", "onnxruntime", "openvino"),
+                        help="suite 모드에서 비교할 백엔드")
+    parser.add_argument("--batch-sizes", type=int, nargs="+", default=[1, 3], help="suite 모드에서 비교할 배치 크기 (드론 수)")
+    parser.add_argument("--resolutions", nargs="+", default=["default"], help="suite 모드의 모델 입력 크기, 예: 640x384 320x192 (default = 모델 기본값)")
+    parser.add_argument("--seed", type=int, default=0, help="합성 프레임 seed")
+    parser.add_argument("--output", default="benchmark_detection.json", help="suite 결과 JSON 파일")
+    parser.add_argument("--compare", help="비교할 이전 suite 결과 JSON 파일")
+    args = parser.parse_args()
+
+    if args.mode == "suite":
+        report = run_suite(args)
+        with open(args.output, "w") as f:
+            json.dump(report, f, indent=2)
+        print(f"[Benchmark] {len(report['results'])} results written to {args.output}")
+        if args.compare:
+            with open(args.compare) as f:
+                for line in compare_suites(json.load(f), report):
+                    print(line)
+        return
+    if not args.stream:
+        parser.error("stream is required for batch, gate and alloc modes")
+
+    from Detection_Model import YoloImageDetector
+    detector = YoloImageDetector(args.model, args.backend, args.device, args.precision)
+    frames = load_frames(args.stream, args.frames)
+    print(f"frames={len(frames)} size={DetectionPipeline.INPUT_SIZE} backend={detector.backend}")
+    if args.mode == "gate":
+        for result in bench_gate(detector, frames, args.thresholds, args.max_skip):
+            print(f"threshold={result['threshold']:4.1f}: skip={result['skip_ratio'] * 100:5.1f}%  recall={result['recall']:.3f}  "
+                  f"precision={result['precision']:.3f}  gate={result['gate_ms_per_frame']:.2f} ms/frame")
+        return
+    if args.mode == "alloc":
+        if not hasattr(detector.backend, "preprocess"):
+            print(f"{detector.backend} does its own preprocessing; use --backend onnxruntime or openvino")
+            return
+        for drones in args.drones:
+            for name, result in bench_preprocess(detector.backend, frames, drones, args.ticks).items():
+                print(f"drones={drones} {name:>12}: {result['alloc_kb_per_frame']:8.1f} KB/frame allocated  "
+                      f"{result['ms_per_frame']:.2f} ms/frame" + (f"  max diff={result['max_abs_diff']:.2e}" if 'max_abs_diff' in result else ""))
+        return
+    for drones in args.drones:
+        bench_batched(detector, frames, drones, args.warmup) # 배치 크기별 첫 호출 비용(메모리 할당, 커널 선택)을 미리 치름
+        bench_single(detector, frames, drones, args.warmup)
+        for name, func in (("single", bench_single), ("batched", bench_batched)):
+            result = func(detector, frames, drones, args.ticks)
+            print(f"drones={drones} {name:>8}: {result['fps']:7.1f} fps  {result['fps_per_core']:7.1f} fps/core  "
+                  f"{result['ms_per_frame']:.2f} ms/frame")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,212 @@
+import argparse
+import collections
+import sys
+import time
+from typing import Dict, List
+from Video_Replay import CAPTURE_MAGIC, read_capture
+from H264_Parser import NAL_IDR, AnnexBParser, iter_nal_units
+
+DATAGRAM_PAYLOAD = 1460 # Tello가 한 번에 보내는 최대 데이터그램 크기
+FRAME_BUFFER_SIZE = 1 << 20
+
+
+def load_datagrams(path: str) -> List[bytes]:
+    '''
+    녹화된 스트림을 데이터그램 목록으로 반환.
+    - VideoReceiver 캡처 파일(.tcap)이면 녹화된 데이터그램을 그대로 사용 (여러 드론이면 첫 번째 드론만).
+    - raw H.264(Annex-B) 파일이면 시작 코드(00 00 00 01) 기준으로 NAL 단위를 나누고, 각 NAL을 1460바이트씩 잘라 마지막 조각이 짧도록 만듦.
+    '''
+    with open(path, "rb") as f:
+        stream = f.read()
+    if stream.startswith(CAPTURE_MAGIC):
+        records = list(read_capture(path))
+        first_ip = records[0][1] if records else ""
+        return [data for _, src_ip, data in records if src_ip == first_ip]
+    starts = []
+    pos = stream.find(b"\x00\x00\x00\x01")
+    while pos != -1:
+        starts.append(pos)
+        pos = stream.find(b"\x00\x00\x00\x01", pos + 4)
+    starts.append(len(stream))
+    datagrams: List[bytes] = []
+    for begin, end in zip(starts, starts[1:]):
+        for off in range(begin, end, DATAGRAM_PAYLOAD):
+            datagrams.append(stream[off:min(off + DATAGRAM_PAYLOAD, end)])
+        if (end - begin) % DATAGRAM_PAYLOAD == 0:
+            datagrams.append(b"") # 길이가 딱 맞아떨어지면 빈 조각으로 프레임 끝을 알림
+    return datagrams
+
+
+def reassemble_concat(datagrams: List[bytes]) -> int:
+    # 기존 방식: buffer += pkt_data (패킷마다 프레임 전체를 재할당/복사)
+    frames = 0
+    buffer = b""
+    for pkt_data in datagrams:
+        buffer += pkt_data
+        if len(pkt_data) < DATAGRAM_PAYLOAD:
+            frames += len(buffer) > 0
+            buffer = b""
+    return frames
+
+
+def reassemble_preallocated(datagrams: List[bytes]) -> int:
+    # 새 방식: recvfrom_into로 받은 슬롯을 미리 할당한 버퍼 뒤에 복사하고 슬라이스를 그대로 넘김
+    slot = memoryview(bytearray(2048))
+    frame_buffer = memoryview(bytearray(FRAME_BUFFER_SIZE))
+    frames = 0
+    size = 0
+    for pkt_data in datagrams:
+        nbytes = len(pkt_data)
+        slot[:nbytes] = pkt_data # 소켓이 슬롯에 써주는 것을 흉내냄
+        if size + nbytes <= FRAME_BUFFER_SIZE:
+            frame_buffer[size:size + nbytes] = slot[:nbytes]
+            size += nbytes
+        else:
+            size = 0
+        if nbytes < DATAGRAM_PAYLOAD and size > 0:
+            access_unit = frame_buffer[:size]
+            frames += len(access_unit) > 0
+            size = 0
+    return frames
+
+
+def bench(func, datagrams: List[bytes], repeat: int) -> float:
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func(datagrams)
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+# 디코더 설정 비교용 조합 (Video_Decoder.DECODER_OPTIONS 형식)
+DECODER_CONFIGS: Dict[str, Dict] = {
+    'slice1_lowdelay': {'thread_type': 'SLICE', 'thread_count': 1, 'low_delay': True},
+    'slice2_lowdelay': {'thread_type': 'SLICE', 'thread_count': 2, 'low_delay': True},
+    'slice4_lowdelay': {'thread_type': 'SLICE', 'thread_count': 4, 'low_delay': True},
+    'frame2': {'thread_type': 'FRAME', 'thread_count': 2, 'low_delay': False},
+    'frame4': {'thread_type': 'FRAME', 'thread_count': 4, 'low_delay': False},
+    'slice2_skiploop': {'thread_type': 'SLICE', 'thread_count': 2, 'low_delay': True, 'skip_loop_filter': 'all'},
+}
+
+
+def split_access_units(datagrams: List[bytes]) -> List[bytes]:
+    # 디코더와 같은 방식(AnnexBParser)으로 access unit 목록을 만듦
+    parser = AnnexBParser()
+    access_units = []
+    for data in datagrams:
+        for access_unit, _ in parser.feed(data, frame_end=len(data) < DATAGRAM_PAYLOAD):
+            access_units.append(bytes(access_unit))
+    return access_units
+
+
+def check_resync(datagrams: List[bytes], cut: float = 0.25, lookahead: int = 120) -> Dict:
+    '''
+    수신 큐가 넘쳐서 IDR 프레임의 앞부분을 잃은 상황을 흉내내서, 디코더의 재동기화(parser.reset() 후 wait_idr)가
+    잘린 IDR의 뒷 슬라이스를 프레임으로 받아들이지 않는지 확인 (받아들이면 위쪽이 깨진 프레임이 탐지로 넘어감).
+    - IDR access unit마다 앞 cut 비율을 잘라낸 뒤 나머지 스트림을 reset()한 파서에 넣고, decoder_worker와 같은 규칙으로
+      처음 받아들인 access unit이 원래 스트림의 온전한 access unit과 같은지 봄.
+    - 슬라이스가 여러 개인 프레임(multi_slice)이 있어야 의미가 있음 (예: libx264 slices=2로 인코딩한 스트림).
+    '''
+    access_units = split_access_units(datagrams)
+    originals = set(access_units)
+    result = {'idr_frames': 0, 'multi_slice': 0, 'clean': 0, 'smeared': 0, 'no_idr': 0}
+    for i, access_unit in enumerate(access_units):
+        nal_types = [nal_type for nal_type, _ in iter_nal_units(access_unit)]
+        if NAL_IDR not in nal_types:
+            continue
+        result['idr_frames'] += 1
+        result['multi_slice'] += nal_types.count(NAL_IDR) > 1
+        data = access_unit[int(len(access_unit) * cut):] + b"".join(access_units[i + 1:i + 1 + lookahead])
+        parser = AnnexBParser()
+        parser.reset()
+        accepted = None
+        for offset in range(0, len(data), DATAGRAM_PAYLOAD):
+            chunk = data[offset:offset + DATAGRAM_PAYLOAD]
+            for unit, unit_types in parser.feed(chunk, frame_end=len(chunk) < DATAGRAM_PAYLOAD):
+                if NAL_IDR in unit_types and parser.clean_idr: # Get_Video.decoder_worker의 wait_idr 규칙
+                    accepted = bytes(unit)
+                    break
+            if accepted is not None:
+                break
+        if accepted is None:
+            result['no_idr'] += 1 # lookahead 안에 다음 IDR이 없음 (스트림 끝)
+        elif accepted in originals:
+            result['clean'] += 1
+        else:
+            result['smeared'] += 1
+    return result
+
+
+def bench_decoder(access_units: List[bytes], options: Dict) -> Dict:
+    '''
+    access unit을 순서대로 디코딩하면서 프레임별 지연(패킷 투입 → 프레임 출력)과 프레임당 CPU 시간을 잼.
+    - FRAME 스레딩은 프레임이 늦게 나오므로 투입 시각을 큐에 쌓아두고 출력 순서대로 꺼내서 계산함.
+    '''
+    import av
+    from Video_Decoder import create_decoder
+    codec = create_decoder(options)
+    submitted = collections.deque()
+    latencies: List[float] = []
+    cpu_start = time.process_time()
+    wall_start = time.perf_counter()
+    for access_unit in access_units:
+        submitted.append(time.perf_counter())
+        try:
+            frames = codec.decode(av.Packet(access_unit))
+        except Exception:
+            submitted.pop()
+            continue
+        now = time.perf_counter()
+        for _ in frames:
+            latencies.append(now - submitted.popleft())
+    for _ in codec.decode(None): # 디코더에 남은 프레임을 비움
+        latencies.append(time.perf_counter() - submitted.popleft())
+    cpu = time.process_time() - cpu_start
+    wall = time.perf_counter() - wall_start
+    latencies.sort()
+    frames = len(latencies)
+    return {
+        'frames': frames,
+        'fps': frames / wall if wall else 0.0,
+        'cpu_ms_per_frame': cpu / frames * 1000 if frames else None,
+        'latency_p50_ms': latencies[frames // 2] * 1000 if frames else None,
+        'latency_p95_ms': latencies[int(frames * 0.95)] * 1000 if frames else None,
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="영상 수신 경로 마이크로벤치마크")
+    parser.add_argument("stream", help="VideoReceiver 캡처 파일 또는 raw H.264(Annex-B) 파일 경로")
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--mode", choices=("reassembly", "decode", "resync"), default="reassembly",
+                        help="reassembly: 패킷 재조립 비교, decode: 디코더 스레드/저지연 설정 비교, "
+                             "resync: 앞부분을 잃은 IDR 뒤 재동기화가 깨진 프레임을 받아들이지 않는지 확인")
+    args = parser.parse_args()
+
+    datagrams = load_datagrams(args.stream)
+    total = sum(len(d) for d in datagrams)
+    print(f"datagrams={len(datagrams)} bytes={total}")
+    if args.mode == "resync":
+        result = check_resync(datagrams)
+        print(f"idr_frames={result['idr_frames']} multi_slice={result['multi_slice']} clean={result['clean']} "
+              f"smeared={result['smeared']} no_idr={result['no_idr']}")
+        if result['smeared']:
+            print("[Benchmark Video] FAIL: a cut IDR frame was accepted after resync")
+            sys.exit(1)
+        return
+    if args.mode == "reassembly":
+        for name, func in (("concat", reassemble_concat), ("preallocated", reassemble_preallocated)):
+            elapsed = bench(func, datagrams, args.repeat)
+            print(f"{name:>12}: {elapsed * 1000:8.2f} ms  {total / elapsed / 1e6:8.1f} MB/s  frames={func(datagrams)}")
+    else:
+        access_units = split_access_units(datagrams)
+        print(f"access_units={len(access_units)}")
+        for name, options in DECODER_CONFIGS.items():
+            result = min((bench_decoder(access_units, options) for _ in range(args.repeat)), key=lambda r: r['cpu_ms_per_frame'] or 0)
+            print(f"{name:>16}: frames={result['frames']} {result['fps']:7.1f} fps  cpu={result['cpu_ms_per_frame']:.2f} ms/frame  "
+                  f"latency p50={result['latency_p50_ms']:.2f} ms p95={result['latency_p95_ms']:.2f} ms")
+
+
+if __name__ == "__main__":
+    main()
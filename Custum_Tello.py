@@ -8,15 +8,17 @@ import math
 from multiprocessing.sharedctypes import SynchronizedArray
 
 class Tello(Action): #Action클래스를 상속받는 Tello 객체.
-    def __init__(self, name : str, tello_address : str, port : int, pipe : Any, drone_location_array : SynchronizedArray, tello_location_array : SynchronizedArray) -> None:
+    def __init__(self, name : str, tello_address : str, port : int, pipe : Any, drone_location_array : SynchronizedArray, tello_location_array : SynchronizedArray, video_port : int = 11111) -> None:
         super().__init__() #상속받는 객체 초기화화
         '''
         tello_address - Tello 드론의 IP 주소 (예: "192.168.0.73")
         port - 내부적으로 바인딩할 포트 번호
+        video_port - 드론이 영상 스트림을 보낼 포트 번호 (드론마다 다르게 줘서 영상 수신 프로세스를 나눔)
         '''
         try:
             self.name = name #드론 이름
             self.port = port
+            self.video_port = video_port #영상 스트림 수신 포트
             self.init_distance = 100 #드론의 초기 거리
             self.drone_distance_offset = 200 #드론과의 거리
             self.tello_to_main_pipe = pipe #tello 입출력 파이프(main과 연결결)
@@ -133,6 +135,8 @@ class Tello(Action): #Action클래스를 상속받는 Tello 객체.
             for _ in range(3):   #command' 명령을 최대 세 번 재전송
                 s = self.command()
                 if s == 'ok': #ok라는 응답이 온다면
+                    if self.video_port != 11111 and not self.change_video_port(): #기본 포트가 아니면 streamon 전에 영상 포트를 바꿔줌
+                        return False
                     self.streamon()
                     return True
             return False
@@ -141,6 +145,15 @@ class Tello(Action): #Action클래스를 상속받는 Tello 객체.
             return False
       
       
+    def change_video_port(self) -> bool: #영상 포트 변경을 최대 세 번 시도. 드론이 거부하면 11111로 계속 보내서 이 드론의 수신 프로세스(VIDEO_PORT_BASE+i)는 영상을 못 받으므로 연결 실패로 처리
+        for _ in range(3):
+            response = self.set_video_port(self.video_port)
+            if response == 'ok':
+                return True
+        print(f"[{self.tello_address}] port {self.video_port} 설정 실패 (응답: {response}), 영상을 받을 수 없어 연결을 중단함")
+        return False
+      
+      
     def tello_control(self): #이 함수는 commander 객체(메인프로세스)에서 파이프로부터 받아온 메세지를 실행하는 부분임.(계속해서 명령을 수행할 부분) 
         self.set_init_drone_state()
         self.set_init_drone_location()
@@ -0,0 +1,76 @@
+import threading
+import time
+from typing import Dict, Tuple
+import cv2
+import numpy as np
+
+FALL_COLOR = (0, 0, 255) # 낙상(cls 1) 박스 색 (BGR)
+NORMAL_COLOR = (0, 255, 0)
+
+
+def draw_detections(frame: np.ndarray, detections: np.ndarray) -> np.ndarray:
+    # (N, 6) [x1, y1, x2, y2, conf, cls] 탐지 결과를 프레임 위에 그림 (frame을 직접 수정함)
+    for x1, y1, x2, y2, conf, cls in detections:
+        color = FALL_COLOR if int(cls) == 1 else NORMAL_COLOR
+        cv2.rectangle(frame, (int(x1), int(y1)), (int(x2), int(y2)), color, 2)
+        cv2.putText(frame, f"{int(cls)} {conf:.2f}", (int(x1), max(int(y1) - 4, 10)), cv2.FONT_HERSHEY_SIMPLEX, 0.5, color, 1)
+    return frame
+
+
+class DebugViewer:
+    '''
+    탐지 결과를 그린 프레임을 별도 스레드에서 화면에 띄우는 디버그 뷰어 (기본은 꺼져 있음, DetectionPipeline에 넘길 때만 동작).
+    - submit()은 드론별 최신 프레임 슬롯 하나를 덮어쓰고 바로 반환함: max_fps를 넘는 프레임은 복사도 하지 않고 버림.
+    - 박스 그리기, imshow, waitKey는 모두 뷰어 스레드에서만 하므로 탐지 경로는 GUI를 기다리지 않음.
+    - 화면이 없는 환경(headless)이라 창을 열 수 없으면 한 번만 알리고 스스로 꺼짐.
+    '''
+    def __init__(self, max_fps: float = 10.0, size: Tuple[int, int] = (854, 480), window_prefix: str = "Detection") -> None:
+        self.interval = 1.0 / max_fps
+        self.size = size # 탐지 좌표 기준 크기 (width, height). 타일 모드의 원본 해상도 프레임은 이 크기로 줄여서 보여줌
+        self.window_prefix = window_prefix
+        self.enabled = True
+        self.lock = threading.Lock()
+        self.slots: Dict[str, Tuple[np.ndarray, np.ndarray]] = {} # ip → (프레임 복사본, 탐지 결과), 아직 화면에 안 그린 최신 것 하나만
+        self.last_submit: Dict[str, float] = {}
+        self.shown: Dict[str, int] = {}
+        self.wakeup = threading.Event()
+        self.thread = threading.Thread(target=self.viewer_loop, daemon=True)
+        self.thread.start()
+
+    def submit(self, ip: str, frame: np.ndarray, detections: np.ndarray) -> bool:
+        # True면 화면에 보낼 프레임으로 받아들임, False면 속도 제한이나 뷰어가 꺼져서 버림
+        now = time.time()
+        if not self.enabled or now - self.last_submit.get(ip, 0.0) < self.interval:
+            return False
+        self.last_submit[ip] = now
+        item = (frame.copy(), detections.copy()) # 디코더/링이 프레임 버퍼를 재사용하므로 보낼 프레임만 복사
+        with self.lock:
+            self.slots[ip] = item
+        self.wakeup.set()
+        return True
+
+    def viewer_loop(self) -> None:
+        while self.enabled:
+            self.wakeup.wait()
+            self.wakeup.clear()
+            with self.lock:
+                items, self.slots = self.slots, {}
+            try:
+                for ip, (frame, detections) in items.items():
+                    if frame.shape[1::-1] != self.size:
+                        frame = cv2.resize(frame, self.size, interpolation=cv2.INTER_LINEAR)
+                    cv2.imshow(f"{self.window_prefix} {ip}", draw_detections(frame, detections))
+                    self.shown[ip] = self.shown.get(ip, 0) + 1
+                cv2.waitKey(1)
+            except cv2.error as e:
+                print(f"[Debug Viewer] display unavailable, viewer disabled: {e}")
+                self.enabled = False
+
+    def close(self) -> None:
+        self.enabled = False
+        self.wakeup.set()
+        self.thread.join()
+        try:
+            cv2.destroyAllWindows()
+        except cv2.error:
+            pass
@@ -0,0 +1,385 @@
+import importlib.util
+import os
+import threading
+import time
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+import cv2
+import numpy as np
+from Model_Cache import MODEL_CACHE_DIR, cached_export, compiled_cache_dir, optimized_model_path
+
+CONF_THRESHOLD = 0.3 # Confidence threshold
+IOU_THRESHOLD = 0.1 # IOU 임계값 (겹침 판단 기준 낮게 설정)
+MAX_DETECTIONS = 100
+IMGSZ = (384, 640) # 내보낸 모델의 입력 크기 (height, width). 854x480 프레임을 ultralytics의 rect 추론과 같은 크기로 letterbox
+CLASSIFIER_IMGSZ = (224, 224) # 낙상 분류기(YOLOv8-cls) 입력 크기. 사람 crop을 이 크기로 letterbox해서 넣음
+MAX_WH = 7680 # 클래스별 NMS를 한 번에 하기 위해 클래스마다 박스를 이만큼 떨어뜨림
+
+
+def letterbox_geometry(shape: Tuple[int, int], new_shape: Tuple[int, int] = IMGSZ) -> Tuple[float, Tuple[int, int], Tuple[int, int]]:
+    # (height, width) 이미지를 new_shape(height, width)에 letterbox할 때의 (축소 비율, (축소 후 width, height), (왼쪽 패딩, 위쪽 패딩))
+    height, width = shape
+    ratio = min(new_shape[0] / height, new_shape[1] / width)
+    resized_w, resized_h = int(round(width * ratio)), int(round(height * ratio))
+    left = int(round((new_shape[1] - resized_w) / 2 - 0.1))
+    top = int(round((new_shape[0] - resized_h) / 2 - 0.1))
+    return ratio, (resized_w, resized_h), (left, top)
+
+
+def letterbox(image: np.ndarray, new_shape: Tuple[int, int] = IMGSZ, color: int = 114) -> Tuple[np.ndarray, float, Tuple[float, float]]:
+    '''
+    비율을 유지한 채 new_shape(height, width)에 맞게 축소하고 남는 부분을 회색으로 채움 (ultralytics 전처리와 같은 방식).
+    - return: (letterbox 이미지, 축소 비율, (좌우 패딩, 상하 패딩))
+    '''
+    ratio, (resized_w, resized_h), (left, top) = letterbox_geometry(image.shape[:2], new_shape)
+    if (resized_w, resized_h) != image.shape[1::-1]:
+        image = cv2.resize(image, (resized_w, resized_h), interpolation=cv2.INTER_LINEAR)
+    bottom, right = new_shape[0] - resized_h - top, new_shape[1] - resized_w - left
+    image = cv2.copyMakeBorder(image, top, bottom, left, right, cv2.BORDER_CONSTANT, value=(color, color, color))
+    return image, ratio, (left, top)
+
+
+class InputBuffers:
+    '''
+    letterbox + 정규화한 모델 입력을 매 프레임 새로 할당하지 않고 미리 잡아둔 버퍼에 바로 쓰는 전처리기.
+    - 드론(키)별 uint8 letterbox 캔버스: 회색 패딩은 입력 크기가 바뀔 때만 칠하고, 매 프레임 resize 결과를 캔버스 안쪽에 바로 씀.
+    - 스레드별 (B, 3, H, W) 입력 텐서: 배치가 더 커질 때만 다시 잡음 (드론별 탐지 스레드가 동시에 추론해도 서로 덮어쓰지 않음).
+    - BGR → RGB, HWC → CHW, dtype 변환, /255를 ufunc 한 번으로 처리해서 중간 배열 없이 텐서에 씀.
+    '''
+    def __init__(self, imgsz: Tuple[int, int], dtype: Any, color: int = 114) -> None:
+        self.imgsz = imgsz
+        self.dtype = dtype
+        self.color = color
+        self.canvases: Dict[Any, List] = {} # 키 → [원본 (height, width), 캔버스, 캔버스 안쪽 뷰, 축소 비율, 패딩]
+        self.local = threading.local()
+
+    def canvas(self, key: Any, shape: Tuple[int, int]) -> List:
+        entry = self.canvases.get(key)
+        if entry is not None and entry[0] == shape:
+            return entry
+        ratio, (resized_w, resized_h), (left, top) = letterbox_geometry(shape, self.imgsz)
+        canvas = entry[1] if entry is not None else np.empty((self.imgsz[0], self.imgsz[1], 3), dtype=np.uint8)
+        canvas.fill(self.color)
+        entry = self.canvases[key] = [shape, canvas, canvas[top:top + resized_h, left:left + resized_w], ratio, (left, top)]
+        return entry
+
+    def fill(self, images: List[np.ndarray], keys: Optional[Sequence[Any]] = None) -> Tuple[np.ndarray, List[Tuple[float, Tuple[int, int]]]]:
+        # keys: 이미지마다 캔버스를 나눌 키 (드론 IP). 없으면 스레드와 배치 안 순서로 나눔 (타일, 사람 crop 등)
+        tensor = getattr(self.local, 'tensor', None)
+        if tensor is None or len(tensor) < len(images):
+            tensor = self.local.tensor = np.empty((len(images), 3, self.imgsz[0], self.imgsz[1]), dtype=self.dtype)
+        transforms = []
+        for i, image in enumerate(images):
+            key = keys[i] if keys is not None else (threading.get_ident(), i)
+            _, canvas, inner, ratio, pad = self.canvas(key, image.shape[:2])
+            if inner.shape == image.shape:
+                np.copyto(inner, image)
+            else:
+                cv2.resize(image, (inner.shape[1], inner.shape[0]), dst=inner, interpolation=cv2.INTER_LINEAR)
+            np.multiply(canvas[:, :, ::-1].transpose(2, 0, 1), 1.0 / 255.0, out=tensor[i], dtype=self.dtype, casting="unsafe")
+            transforms.append((ratio, pad))
+        return tensor[:len(images)], transforms
+
+
+def nms(boxes: np.ndarray, scores: np.ndarray, iou_threshold: float = IOU_THRESHOLD) -> np.ndarray:
+    '''
+    NumPy NMS. 점수 순으로 남은 박스 전체와의 IoU를 한 번에 계산해서 겹치는 박스를 제거함.
+    - boxes: (N, 4) xyxy, scores: (N,)
+    - return: 남길 박스의 인덱스 (점수 내림차순)
+    '''
+    x1, y1, x2, y2 = boxes[:, 0], boxes[:, 1], boxes[:, 2], boxes[:, 3]
+    areas = (x2 - x1).clip(0) * (y2 - y1).clip(0)
+    order = scores.argsort()[::-1]
+    keep = []
+    while order.size:
+        i = order[0]
+        keep.append(i)
+        rest = order[1:]
+        w = (np.minimum(x2[i], x2[rest]) - np.maximum(x1[i], x1[rest])).clip(0)
+        h = (np.minimum(y2[i], y2[rest]) - np.maximum(y1[i], y1[rest])).clip(0)
+        inter = w * h
+        iou = inter / (areas[i] + areas[rest] - inter + 1e-9)
+        order = rest[iou <= iou_threshold]
+    return np.array(keep, dtype=np.int64)
+
+
+def postprocess(output: np.ndarray, ratio: float, pad: Tuple[float, float], image_shape: Tuple[int, ...],
+                conf: float = CONF_THRESHOLD, iou: float = IOU_THRESHOLD, max_det: int = MAX_DETECTIONS) -> np.ndarray:
+    '''
+    YOLOv8 형식 출력 (4 + 클래스 수, 앵커 수) 하나를 원본 이미지 좌표의 탐지 결과로 변환.
+    - return: (N, 6) float32 [x1, y1, x2, y2, conf, cls]
+    '''
+    predictions = output.T # (앵커 수, 4 + 클래스 수)
+    class_scores = predictions[:, 4:]
+    classes = class_scores.argmax(axis=1)
+    scores = class_scores[np.arange(len(classes)), classes]
+    mask = scores > conf
+    if not mask.any():
+        return np.zeros((0, 6), dtype=np.float32)
+    cxcywh, scores, classes = predictions[mask, :4], scores[mask], classes[mask]
+    boxes = np.empty_like(cxcywh)
+    boxes[:, :2] = cxcywh[:, :2] - cxcywh[:, 2:] / 2
+    boxes[:, 2:] = cxcywh[:, :2] + cxcywh[:, 2:] / 2
+    keep = nms(boxes + classes[:, None] * MAX_WH, scores, iou)[:max_det] # 클래스마다 좌표를 떨어뜨려서 클래스별 NMS를 한 번에 처리
+    boxes = boxes[keep]
+    boxes[:, [0, 2]] = ((boxes[:, [0, 2]] - pad[0]) / ratio).clip(0, image_shape[1])
+    boxes[:, [1, 3]] = ((boxes[:, [1, 3]] - pad[1]) / ratio).clip(0, image_shape[0])
+    return np.concatenate([boxes, scores[keep, None], classes[keep, None]], axis=1).astype(np.float32)
+
+
+def tile_grid(width: int, height: int, tile_size: Tuple[int, int], overlap: float) -> np.ndarray:
+    '''
+    width x height 이미지를 tile_size(width, height) 타일로 최소 overlap 비율만큼 겹치게 덮는 격자. 타일은 양 끝에 맞춰 고르게 배치함.
+    - return: (T, 4) int [x1, y1, x2, y2]
+    '''
+    def starts(length: int, tile: int) -> List[int]:
+        if length <= tile:
+            return [0]
+        step = max(int(tile * (1 - overlap)), 1)
+        count = -(-(length - tile) // step) + 1 # 겹침이 overlap 이상이 되는 최소 타일 수
+        return [round(i * (length - tile) / (count - 1)) for i in range(count)]
+    tile_w, tile_h = tile_size
+    return np.array([(x, y, min(x + tile_w, width), min(y + tile_h, height))
+                     for y in starts(height, tile_h) for x in starts(width, tile_w)], dtype=np.int64)
+
+
+def boxes_intersect(tiles: np.ndarray, regions: np.ndarray) -> np.ndarray:
+    # 타일(T, 4)과 관심 영역(R, 4)이 서로 겹치는지 (T, R) bool (xyxy)
+    overlap_x = (tiles[:, None, 0] < regions[None, :, 2]) & (regions[None, :, 0] < tiles[:, None, 2])
+    overlap_y = (tiles[:, None, 1] < regions[None, :, 3]) & (regions[None, :, 1] < tiles[:, None, 3])
+    return overlap_x & overlap_y
+
+
+def merge_detections(detections: np.ndarray, iou: float = IOU_THRESHOLD) -> np.ndarray:
+    # 여러 타일/전체 프레임에서 나온 (N, 6) 탐지 결과를 클래스별 NMS로 합침 (타일 경계에서 중복된 박스 제거)
+    if not len(detections):
+        return detections
+    keep = nms(detections[:, :4] + detections[:, 5:6] * MAX_WH, detections[:, 4], iou)
+    return detections[keep]
+
+
+def detect_hardware() -> Dict:
+    # 설치된 런타임과 쓸 수 있는 가속기를 확인 (모듈은 있을 때만 불러옴)
+    hardware = {'cuda': False, 'openvino_devices': [], 'ort_providers': []}
+    if importlib.util.find_spec("torch"):
+        import torch
+        hardware['cuda'] = torch.cuda.is_available()
+    if importlib.util.find_spec("openvino"):
+        import openvino
+        hardware['openvino_devices'] = openvino.Core().available_devices
+    if importlib.util.find_spec("onnxruntime"):
+        import onnxruntime
+        hardware['ort_providers'] = onnxruntime.get_available_providers()
+    return hardware
+
+
+class InferenceBackend:
+    '''
+    YoloImageDetector 아래에서 실제 추론을 맡는 백엔드의 공통 형태.
+    - predict(images)는 BGR 프레임 목록을 받아 프레임마다 (N, 6) [x1, y1, x2, y2, conf, cls] 배열을 돌려줌 (원본 이미지 좌표).
+    '''
+    name = "base"
+
+    def __init__(self, model_path: str, device: str, precision: str, conf: float = CONF_THRESHOLD, iou: float = IOU_THRESHOLD) -> None:
+        self.model_path = model_path
+        self.device = device
+        self.precision = precision # "fp32" | "fp16" | "int8"
+        self.conf = conf
+        self.iou = iou
+        self.load_time = 0.0 # 모델을 읽고 세션을 만드는 데 걸린 시간(초, create_backend가 채움)
+        self.last_timings: Dict[str, float] = {} # 마지막 predict 호출의 단계별 시간(초, 배치 전체): preprocess, inference, postprocess
+
+    def predict(self, images: List[np.ndarray], conf: Optional[float] = None, keys: Optional[Sequence[Any]] = None) -> List[np.ndarray]:
+        # conf: 이번 호출에만 쓸 confidence threshold (None이면 self.conf)
+        # keys: 이미지마다 전처리 버퍼를 나눌 키 (드론 IP, InputBuffers 참고)
+        raise NotImplementedError
+
+    def classify(self, images: List[np.ndarray]) -> np.ndarray:
+        # 분류 모델(YOLOv8-cls)용: 이미지 목록 → (B, 클래스 수) 확률
+        raise NotImplementedError
+
+    def __repr__(self) -> str:
+        return f"{self.name}({os.path.basename(self.model_path)}, device={self.device}, precision={self.precision})"
+
+
+class UltralyticsBackend(InferenceBackend):
+    # 기존 ultralytics/torch 경로 (전처리, NMS는 ultralytics가 처리)
+    name = "ultralytics"
+
+    def __init__(self, model_path: str, device: str, precision: str, imgsz: Optional[Tuple[int, int]] = None, **kwargs) -> None:
+        super().__init__(model_path, device, precision, **kwargs)
+        from ultralytics import YOLO
+        self.model = YOLO(model_path) #훈련된 모델을 로드함.
+        self.predict_options = {'imgsz': list(imgsz)} if imgsz else {} # 입력 크기를 주지 않으면 모델에 저장된 크기를 씀
+
+    def predict(self, images: List[np.ndarray], conf: Optional[float] = None, keys: Optional[Sequence[Any]] = None) -> List[np.ndarray]:
+        # letterbox/정규화는 ultralytics 안에서 함 (keys는 쓰지 않음)
+        results = self.model.predict(list(images), iou=self.iou, conf=self.conf if conf is None else conf, half=self.precision == "fp16",
+                                     device=self.device, verbose=False, **self.predict_options)
+        speed = getattr(results[0], 'speed', None) if results else None # ultralytics가 잰 이미지당 단계별 시간(ms)
+        if speed:
+            self.last_timings = {stage: speed[stage] * len(results) / 1000 for stage in ('preprocess', 'inference', 'postprocess')}
+        return [result.boxes.cpu().numpy().data.astype(np.float32) for result in results]
+
+    def classify(self, images: List[np.ndarray]) -> np.ndarray:
+        results = self.model.predict(list(images), half=self.precision == "fp16", device=self.device, verbose=False, **self.predict_options)
+        return np.stack([result.probs.cpu().numpy().data for result in results]).astype(np.float32)
+
+
+class ExportedModelBackend(InferenceBackend):
+    '''
+    ONNX 등으로 내보낸 YOLOv8 모델을 쓰는 백엔드의 공통 전처리(letterbox)와 후처리(NumPy NMS).
+    - 하위 클래스는 run(batch)만 구현함: (B, 3, H, W) 입력 → (B, 4 + 클래스 수, 앵커 수) 출력
+    '''
+    def __init__(self, model_path: str, device: str, precision: str, imgsz: Tuple[int, int] = IMGSZ,
+                 cache_dir: Optional[str] = None, **kwargs) -> None:
+        super().__init__(model_path, device, precision, **kwargs)
+        self.imgsz = imgsz
+        self.cache_dir = cache_dir # 있으면 최적화/컴파일된 모델을 여기에 저장해 두고 다음 실행부터 재사용
+        self.input_dtype = np.float16 if precision == "fp16" else np.float32
+        self.buffers: Optional[InputBuffers] = None # 하위 클래스가 모델 입력 크기/타입을 정한 뒤 처음 전처리할 때 만듦
+
+    def preprocess(self, images: List[np.ndarray], keys: Optional[Sequence[Any]] = None) -> Tuple[np.ndarray, List[Tuple[float, Tuple[int, int]]]]:
+        # 반환하는 입력 텐서는 다음 호출 때 덮어써지는 버퍼이므로 run이 끝나기 전까지만 유효함
+        if self.buffers is None:
+            self.buffers = InputBuffers(self.imgsz, self.input_dtype)
+        return self.buffers.fill(images, keys)
+
+    def run(self, batch: np.ndarray) -> np.ndarray:
+        raise NotImplementedError
+
+    def predict(self, images: List[np.ndarray], conf: Optional[float] = None, keys: Optional[Sequence[Any]] = None) -> List[np.ndarray]:
+        start = time.perf_counter()
+        batch, transforms = self.preprocess(images, keys)
+        preprocessed = time.perf_counter()
+        outputs = self.run(batch).astype(np.float32)
+        inferred = time.perf_counter()
+        detections = [postprocess(output, ratio, pad, image.shape, self.conf if conf is None else conf, self.iou)
+                      for output, (ratio, pad), image in zip(outputs, transforms, images)]
+        self.last_timings = {'preprocess': preprocessed - start, 'inference': inferred - preprocessed, 'postprocess': time.perf_counter() - inferred}
+        return detections
+
+    def classify(self, images: List[np.ndarray]) -> np.ndarray:
+        # 내보낸 YOLOv8-cls 모델은 softmax까지 포함하므로 출력이 그대로 확률
+        batch, _ = self.preprocess(images)
+        return self.run(batch).astype(np.float32)
+
+
+class OnnxRuntimeBackend(ExportedModelBackend):
+    name = "onnxruntime"
+
+    def __init__(self, model_path: str, device: str, precision: str, **kwargs) -> None:
+        super().__init__(model_path, device, precision, **kwargs)
+        import onnxruntime
+        providers = ["CUDAExecutionProvider", "CPUExecutionProvider"] if device == "cuda" else ["CPUExecutionProvider"]
+        options = onnxruntime.SessionOptions()
+        options.graph_optimization_level = onnxruntime.GraphOptimizationLevel.ORT_ENABLE_ALL
+        source = model_path
+        if self.cache_dir:
+            optimized = optimized_model_path(model_path, device, self.cache_dir)
+            if os.path.exists(optimized): # 이미 최적화된 그래프면 다시 최적화하지 않음
+                source = optimized
+                options.graph_optimization_level = onnxruntime.GraphOptimizationLevel.ORT_DISABLE_ALL
+            else:
+                os.makedirs(self.cache_dir, exist_ok=True)
+                options.optimized_model_filepath = optimized # 이 PC의 CPU에 맞춘 최적화가 들어가므로 캐시 폴더를 다른 PC로 복사하지 않음
+        self.session = onnxruntime.InferenceSession(source, options, providers=providers)
+        model_input = self.session.get_inputs()[0]
+        self.input_name = model_input.name
+        if isinstance(model_input.shape[2], int) and isinstance(model_input.shape[3], int): # 고정 크기로 내보낸 모델이면 그 크기를 따름
+            self.imgsz = (model_input.shape[2], model_input.shape[3])
+        self.input_dtype = np.float16 if "float16" in model_input.type else np.float32 # 정밀도는 내보낸 모델을 따름
+        self.fixed_batch = model_input.shape[0] == 1 # batch 1로 고정해서 내보낸 ONNX (ONNX Runtime은 reshape할 수 없으므로 한 장씩 돌림)
+
+    def run(self, batch: np.ndarray) -> np.ndarray:
+        if self.fixed_batch and len(batch) > 1:
+            return np.concatenate([self.session.run(None, {self.input_name: batch[i:i + 1]})[0] for i in range(len(batch))])
+        return self.session.run(None, {self.input_name: batch})[0]
+
+
+class OpenVINOBackend(ExportedModelBackend):
+    name = "openvino"
+
+    def __init__(self, model_path: str, device: str, precision: str, **kwargs) -> None:
+        super().__init__(model_path, device, precision, **kwargs)
+        import openvino
+        core = openvino.Core()
+        if self.cache_dir:
+            core.set_property({"CACHE_DIR": compiled_cache_dir(self.cache_dir)}) # 컴파일 결과를 저장해 두고 다음 실행부터 바로 불러옴
+        model = core.read_model(model_path) # .xml(IR) 또는 .onnx
+        shape = model.inputs[0].get_partial_shape()
+        if shape[2].is_static and shape[3].is_static:
+            self.imgsz = (shape[2].get_length(), shape[3].get_length())
+        if shape[0].is_static: # ultralytics의 IR은 batch 1로 고정되어 나오므로 배치/타일 추론이 되도록 batch 차원만 풀어줌
+            shape[0] = -1
+            model.reshape({model.inputs[0]: shape})
+        config = {"INFERENCE_PRECISION_HINT": "f16" if precision == "fp16" else "f32", "PERFORMANCE_HINT": "LATENCY"}
+        self.compiled = core.compile_model(model, device, config)
+        self.input_dtype = np.float32 # 입력은 FP32로 넣고 정밀도는 플러그인이 맞춤
+
+    def run(self, batch: np.ndarray) -> np.ndarray:
+        return self.compiled(batch)[0]
+
+
+BACKENDS = {
+    'ultralytics': UltralyticsBackend,
+    'onnxruntime': OnnxRuntimeBackend,
+    'openvino': OpenVINOBackend,
+}
+
+
+def select_backend(backend: str = "auto", device: str = "auto", precision: str = "auto",
+                   hardware: Optional[Dict] = None) -> Tuple[str, str, str]:
+    '''
+    설치된 런타임과 하드웨어를 보고 (백엔드, 장치, 정밀도)를 정함. 직접 지정한 값은 그대로 둠.
+    - CUDA GPU → ultralytics/torch, GPU 0번, FP16 (기존 동작)
+    - GPU가 없으면 OpenVINO(CPU, 인텔 GPU가 있으면 GPU FP16) → ONNX Runtime(CPU) → ultralytics(CPU) 순서
+    - precision="int8"이면 OpenVINO → ONNX Runtime 순서, 장치는 CPU (Model_Quantize 참고)
+    '''
+    hardware = hardware if hardware is not None else detect_hardware()
+    if precision == "int8" and backend == "ultralytics":
+        raise ValueError("int8 precision needs an exported model backend (onnxruntime or openvino)")
+    if backend == "auto":
+        if precision == "int8": # INT8 모델은 CPU용 런타임으로만 돌림
+            backend = "openvino" if hardware['openvino_devices'] else "onnxruntime"
+        elif hardware['cuda'] and importlib.util.find_spec("ultralytics"):
+            backend = "ultralytics"
+        elif hardware['openvino_devices']:
+            backend = "openvino"
+        elif hardware['ort_providers']:
+            backend = "onnxruntime"
+        else:
+            backend = "ultralytics"
+    if device == "auto":
+        if precision == "int8":
+            device = "CPU" if backend == "openvino" else "cpu"
+        elif backend == "ultralytics":
+            device = "0" if hardware['cuda'] else "cpu"
+        elif backend == "openvino":
+            device = "GPU" if "GPU" in hardware['openvino_devices'] else "CPU"
+        else:
+            device = "cuda" if "CUDAExecutionProvider" in hardware['ort_providers'] else "cpu"
+    if precision == "auto":
+        precision = "fp16" if device.lower() not in ("cpu",) else "fp32" # CPU에서 FP16은 대부분 더 느리거나 지원하지 않음
+    return backend, device, precision
+
+
+def create_backend(model_path: str, backend: str = "auto", device: str = "auto", precision: str = "auto",
+                   cache_dir: Optional[str] = MODEL_CACHE_DIR, calibration: Optional[str] = None, **kwargs) -> InferenceBackend:
+    # cache_dir: 내보낸/최적화된 모델 캐시 폴더 (Model_Cache 참고). None이면 .pt는 매번 내보내고 최적화 결과도 저장하지 않음
+    # calibration: precision="int8"일 때 보정 프레임 (이미지 폴더 또는 영상 파일, None이면 Model_Quantize.CALIBRATION_SOURCE)
+    backend, device, precision = select_backend(backend, device, precision)
+    if backend == "ultralytics":
+        if device.isdigit():
+            device = int(device)
+    else:
+        kwargs['cache_dir'] = cache_dir
+        if precision == "int8": # 보정해서 만든 INT8 모델(QDQ ONNX)을 캐시에서 가져오거나 새로 만듦
+            from Model_Quantize import quantized_model
+            model_path = quantized_model(model_path, backend, kwargs.get('imgsz', IMGSZ), calibration, cache_dir or ".")
+        elif model_path.endswith(".pt"):
+            model_path = cached_export(model_path, backend, precision, kwargs.get('imgsz', IMGSZ), cache_dir or ".")
+    start = time.perf_counter()
+    instance = BACKENDS[backend](model_path, device, precision, **kwargs)
+    instance.load_time = time.perf_counter() - start
+    print(f"[Detection Backend] {instance} loaded in {instance.load_time * 1000:.0f} ms")
+    return instance
@@ -1,11 +1,60 @@
-from ultralytics import YOLO
+import time
 import numpy as np
 import cv2
+from Detection_Backend import CLASSIFIER_IMGSZ, IMGSZ, boxes_intersect, create_backend, letterbox, merge_detections, tile_grid
 
 class YoloImageDetector:
-    def __init__(self, model_path="rand2.pt"):
-        self.model = YOLO(model_path) #훈련된 모델을 로드함.
+    TRACK_RADIUS = 50 # 이전 트랙과 같은 객체로 보는 중심 좌표 거리(px)
+
+    def __init__(self, model_path="rand2.pt", backend="auto", device="auto", precision="auto",
+                 tiled=False, input_size=(854, 480), tile_size=(IMGSZ[1], IMGSZ[0]), tile_overlap=0.2, roi_conf=0.05, max_tiles=8,
+                 cascade=False, person_model_path="person.pt", classifier_path="fall_cls.pt", person_class=0, fall_class=1,
+                 fall_threshold=0.5, uncertain_margin=0.25, reclassify_interval=15, crop_padding=0.1, imgsz=None, calibration=None):
+        # backend: "ultralytics" | "onnxruntime" | "openvino" | "auto", device/precision도 "auto"면 하드웨어를 보고 정함 (Detection_Backend 참고)
+        # tiled: 원본 해상도 프레임을 받아 관심 영역만 타일로 잘라 한 번 더 추론 (높은 고도에서 작게 보이는 사람용, predict_tiled 참고)
+        # cascade: model_path 대신 작은 사람 탐지 모델(person_model_path)로 찾고, 사람 crop만 낙상 분류기(classifier_path)에 넣음 (classify_falls 참고)
+        # imgsz: 모델 입력 크기 (height, width). None이면 내보낸 모델은 IMGSZ, ultralytics는 모델에 저장된 크기
+        # precision="int8": CPU용 INT8 양자화 모델. calibration(보정 프레임 폴더/영상)으로 처음 한 번 만들고 캐시함 (Model_Quantize 참고)
+        self.cascade = cascade
+        self.backend = create_backend(person_model_path if cascade else model_path, backend, device, precision, calibration=calibration,
+                                      **({'imgsz': imgsz} if imgsz else {})) #훈련된 모델을 로드함.
+        # 분류기는 사람 crop으로 보정해야 하므로 INT8로 바꾸지 않음 (crop만 넣으므로 이미 가벼움)
+        self.classifier = create_backend(classifier_path, backend, device, "fp32" if precision == "int8" else precision,
+                                         imgsz=CLASSIFIER_IMGSZ) if cascade else None
         self.sessions = {} # IP별 세션 상태를 저장하는 딕셔너리
+        self.startup_times = {'load_ms': self.backend.load_time * 1000} # 모델 로드/첫 추론(cold)/준비 후 추론(warm) 시간
+        self.tiled = tiled
+        self.input_size = input_size # 모델이 학습된 입력 크기 (width, height). 탐지 좌표와 추적은 항상 이 크기 기준
+        self.tile_size = tile_size # (width, height). 모델 입력 크기와 같게 잘라서 타일은 축소 없이 원본 픽셀로 추론됨
+        self.tile_overlap = tile_overlap
+        self.roi_conf = roi_conf # 전체 프레임 추론에서 이 점수 이상인 박스 주변을 관심 영역으로 봄
+        self.max_tiles = max_tiles # 프레임당 최대 타일 수 (관심 영역이 많으면 점수 높은 쪽부터)
+        self.person_class = person_class # 사람 탐지 모델에서 사람 클래스 번호 (COCO 모델이면 0)
+        self.fall_class = fall_class # 분류기 출력에서 낙상 클래스 번호
+        self.fall_threshold = fall_threshold
+        self.uncertain_margin = uncertain_margin # 낙상 확률이 fall_threshold ± 이 값 안이면 애매한 트랙으로 보고 매 프레임 다시 분류
+        self.reclassify_interval = reclassify_interval # 확실한 트랙도 이 프레임 수마다 한 번은 다시 분류
+        self.crop_padding = crop_padding # 사람 박스를 이 비율만큼 넓혀서 자름 (넘어진 자세가 박스 밖으로 조금 나가도 보이게)
+
+
+    def warmup(self, frame_shape, batch_sizes=(1,), runs=3):
+        # 첫 추론은 메모리 할당, 커널 선택 등으로 매우 느리므로 영상이 들어오기 전에 실제로 쓸 배치 크기로 미리 돌려둠
+        frame = np.zeros(frame_shape, dtype=np.uint8)
+        for batch_size in batch_sizes:
+            times = []
+            for _ in range(runs):
+                start = time.perf_counter()
+                self.detect([frame] * batch_size)
+                if self.tiled: # 타일 배치도 처음 한 번은 느리므로 같이 돌려둠
+                    self.backend.predict([frame[:self.tile_size[1], :self.tile_size[0]]] * self.max_tiles * batch_size)
+                if self.cascade: # 빈 프레임에서는 사람이 안 나와서 분류기가 돌지 않으므로 따로 돌려둠
+                    self.classifier.classify([frame[:CLASSIFIER_IMGSZ[0], :CLASSIFIER_IMGSZ[1]]] * batch_size)
+                times.append((time.perf_counter() - start) * 1000)
+            self.startup_times[f'cold_ms_batch{batch_size}'] = times[0]
+            self.startup_times[f'warm_ms_batch{batch_size}'] = times[-1]
+            print(f"[Detection Model] warm-up batch={batch_size}: cold {times[0]:.0f} ms -> warm {times[-1]:.0f} ms "
+                  f"(load {self.startup_times['load_ms']:.0f} ms)")
+        return self.startup_times
 
 
     def ensure_session(self, ip):
@@ -13,7 +62,12 @@ class YoloImageDetector:
         if ip not in self.sessions:
             self.sessions[ip] = {
                 'dic': {}, # 객체 ID별 박스, 누적 카운트, 시간 정보 저장
-                'count': 1 # 새 객체에 부여할 고유 ID 번호
+                'count': 1, # 새 객체에 부여할 고유 ID 번호
+                'last': np.zeros((0, 6), dtype=np.float32), # 마지막으로 추론한 탐지 결과 (장면이 그대로라 추론을 건너뛴 프레임에 재사용)
+                'falls': {}, # cascade: 트랙 ID별 [낙상 확률, 마지막 분류 후 지난 프레임 수]
+                'unassigned': [], # cascade: 트랙이 아직 없는 사람의 (중심 좌표, 낙상 확률). 다음 프레임에 새로 생긴 트랙 ID로 옮김
+                'track_ids': np.zeros(0, dtype=np.uint32), # 'last'의 박스마다 이어진 객체 ID (0 = 낙상 확정으로 중간에 끝나서 ID를 받지 못함)
+                'confirmed': -1 # 'last'에서 낙상이 확정된 박스의 인덱스 (-1이면 없음)
             }
             
             
@@ -38,12 +92,12 @@ class YoloImageDetector:
             # 최초 객체 → 새로운 ID 부여
             dic[cnt] = np.array([box, 0, 0], dtype=object) # [좌표, 탐지 객체, 프레임 생존 시간]
             session['count'] += 1
-            return 0, 0
+            return 0, cnt
         indices = list(dic.keys())
         coords = np.array([v[0] for v in dic.values()], dtype=float)
         dists = np.linalg.norm(coords - box, axis=1) # 기존 객체들과의 거리 계산
         nearest_id = indices[np.argmin(dists)]
-        if np.min(dists) < 50:
+        if np.min(dists) < self.TRACK_RADIUS:
             # 가까운 기존 객체로 판단 → 상태 갱신
             rec = dic[nearest_id]
             rec[1] = np.clip(rec[1] + (1 if fall else -1), 0, 2) # 낙상 누적 카운트 조정
@@ -53,42 +107,193 @@ class YoloImageDetector:
             # 새 객체로 판단 → 새로운 ID 부여
             dic[cnt] = np.array([box, 0, 0], dtype=object)
             session['count'] += 1
-            return 0, 0
+            return 0, cnt
 
 
     def predict_image(self, image : np.ndarray, ip_address):
-        # 프레임 복사 및 디버그용 화면 출력
-        frame = image.copy()
-        cv2.imshow("a", frame)
-        cv2.waitKey(1)
-        self.ensure_session(ip_address) # 세션 준비
+        # 디버그 화면 출력은 DetectionPipeline의 DebugViewer가 별도 스레드에서 함 (여기서는 복사/imshow 없이 바로 추론)
+        detections = self.detect([image], [ip_address])[0]
+        return self.update_session(ip_address, detections)
+
+
+    def predict_batch(self, images, ip_addresses):
+        """
+        여러 드론의 프레임을 백엔드 추론 한 번으로 처리하고, 결과를 각 IP의 세션으로 나눠서 갱신
+        - images: 프레임 목록 (모두 같은 크기)
+        - ip_addresses: images와 같은 순서의 드론 IP 목록
+        - return: IP 순서대로 predict_image와 같은 (x, y, 감지 여부) 목록
+        """
+        results = self.detect(list(images), ip_addresses)
+        return [self.update_session(ip, detections) for ip, detections in zip(ip_addresses, results)]
+
+
+    def detect(self, images, ip_addresses=None):
+        # 프레임 목록 → 프레임마다 input_size 좌표의 (N, 6) 탐지 결과 (tiled면 타일 추론, cascade면 낙상 분류까지 포함)
+        # ip_addresses: cascade에서 트랙별 분류 결과를 재사용할 때 씀 (None이면 사람마다 모두 분류)
+        detections = self.predict_tiled(images, ip_addresses) if self.tiled else self.backend.predict(images, keys=ip_addresses)
+        if self.cascade:
+            return self.classify_falls(images, detections, ip_addresses)
+        return detections
+
+
+    def classify_falls(self, images, detections, ip_addresses=None):
+        """
+        cascade 2단계: 사람 탐지 결과의 cls를 낙상 분류기 결과(낙상 1, 정상 0)로 바꿈
+        - 트랙마다 마지막 낙상 확률을 기억해 두고, 새로 나타났거나 / 확률이 애매하거나 / 낙상 누적 중이거나 /
+          reclassify_interval 프레임 동안 다시 보지 않은 트랙만 crop을 잘라 모든 드론 것을 한 번에 분류함
+        - 나머지 트랙은 기억해 둔 확률을 그대로 씀 (서 있거나 걷는 사람만 있는 장면은 분류기를 거의 돌리지 않음)
+        """
+        crops, targets, results = [], [], []
+        for i, (image, persons) in enumerate(zip(images, detections)):
+            persons = persons[persons[:, 5] == self.person_class].copy()
+            probs = np.zeros(len(persons), dtype=np.float32)
+            ip = ip_addresses[i] if ip_addresses is not None else None
+            centres = ((persons[:, :2] + persons[:, 2:4]) / 2).astype(int) # update_session과 같은 중심 좌표
+            tracks = self.fall_tracks(ip, centres) if ip is not None else [None] * len(persons)
+            for j, track in enumerate(tracks):
+                cached = self.sessions[ip]['falls'].get(track) if track is not None else None
+                if cached is not None and not self.uncertain(ip, track):
+                    probs[j] = cached[0]
+                    cached[1] += 1
+                else:
+                    crops.append(self.crop_person(image, persons[j, :4]))
+                    targets.append((i, j, ip, track, centres[j]))
+            results.append((persons, probs))
+        if crops:
+            fall_probs = self.classifier.classify(crops)[:, self.fall_class]
+            for (i, j, ip, track, centre), prob in zip(targets, fall_probs):
+                results[i][1][j] = prob
+                if ip is None:
+                    continue
+                if track is not None:
+                    self.sessions[ip]['falls'][track] = [float(prob), 0]
+                else:
+                    self.sessions[ip]['unassigned'].append((centre, float(prob)))
+        for persons, probs in results:
+            persons[:, 5] = (probs >= self.fall_threshold).astype(np.float32)
+        return [persons for persons, _ in results]
+
+
+    def fall_tracks(self, ip_address, centres):
+        # 사람 박스 중심 좌표마다 detect_dic이 이어 붙일 트랙 ID (없으면 None). 지난 프레임에 새로 생긴 트랙은 여기서 분류 결과를 넘겨받음
+        self.ensure_session(ip_address)
+        session = self.sessions[ip_address]
+        falls = session['falls']
+        for centre, prob in session['unassigned']:
+            track = self.nearest_track(ip_address, centre)
+            if track is not None and track not in falls:
+                falls[track] = [prob, 1]
+        session['unassigned'] = []
+        for track in [track for track in falls if track not in session['dic']]: # cleanup으로 사라진 트랙
+            del falls[track]
+        return [self.nearest_track(ip_address, centre) for centre in centres]
+
+
+    def nearest_track(self, ip_address, centre):
+        # detect_dic과 같은 기준(TRACK_RADIUS 안에서 가장 가까운 트랙)으로 이어질 트랙 ID를 찾음
         dic = self.sessions[ip_address]['dic']
+        if not dic:
+            return None
+        indices = list(dic.keys())
+        dists = np.linalg.norm(np.array([v[0] for v in dic.values()], dtype=float) - centre, axis=1)
+        return indices[int(np.argmin(dists))] if np.min(dists) < self.TRACK_RADIUS else None
+
+
+    def uncertain(self, ip_address, track):
+        # 다시 분류해야 하는 트랙인지: 확률이 임계값 근처이거나, 낙상 누적 중이거나, 분류한 지 오래됨
+        prob, age = self.sessions[ip_address]['falls'][track]
+        return (abs(prob - self.fall_threshold) < self.uncertain_margin or age >= self.reclassify_interval
+                or self.sessions[ip_address]['dic'][track][1] > 0)
+
+
+    def crop_person(self, image, box):
+        # input_size 좌표의 사람 박스를 crop_padding만큼 넓혀서 image(원본 또는 input_size)에서 자르고 분류기 입력 크기로 letterbox
+        scale = np.array([image.shape[1] / self.input_size[0], image.shape[0] / self.input_size[1]] * 2)
+        x1, y1, x2, y2 = box * scale
+        pad_w, pad_h = (x2 - x1) * self.crop_padding, (y2 - y1) * self.crop_padding
+        x1, y1 = int(np.clip(x1 - pad_w, 0, image.shape[1] - 1)), int(np.clip(y1 - pad_h, 0, image.shape[0] - 1))
+        x2, y2 = int(np.clip(x2 + pad_w, x1 + 1, image.shape[1])), int(np.clip(y2 + pad_h, y1 + 1, image.shape[0]))
+        return letterbox(image[y1:y2, x1:x2], CLASSIFIER_IMGSZ)[0]
+
+
+    def predict_tiled(self, images, ip_addresses=None):
+        """
+        관심 영역만 타일로 잘라서 추론하는 모드
+        1. 원본 프레임을 input_size로 줄여서 전체 추론 (roi_conf까지 낮춘 점수로 후보도 같이 찾음)
+        2. 후보 박스 주변과 겹치는 타일만 원본 해상도에서 잘라서 모든 프레임의 타일을 한 번에 배치 추론
+        3. 전체 프레임 결과와 타일 결과를 원본 좌표로 모아 클래스별 NMS로 합친 뒤 input_size 좌표로 되돌림
+        - images: 원본 해상도 프레임 목록, ip_addresses: 전체 프레임 추론의 드론별 입력 버퍼 키
+        """
+        width, height = self.input_size
+        small = [cv2.resize(image, self.input_size, interpolation=cv2.INTER_CUBIC) for image in images]
+        coarse = self.backend.predict(small, conf=min(self.roi_conf, self.backend.conf), keys=ip_addresses)
+        crops, owners, origins, merged = [], [], [], []
+        for i, (image, detections) in enumerate(zip(images, coarse)):
+            scale = np.array([image.shape[1] / width, image.shape[0] / height] * 2, dtype=np.float32)
+            confident = detections[detections[:, 4] >= self.backend.conf].copy()
+            confident[:, :4] *= scale
+            merged.append([confident])
+            if not len(detections): # 후보가 없으면 타일 추론 없이 전체 프레임 결과만 씀
+                continue
+            regions = detections[:, :4] * scale
+            margin = np.maximum(regions[:, 2:] - regions[:, :2], 32) # 후보 박스 크기만큼 주변까지 관심 영역으로 넓힘
+            regions[:, :2] -= margin
+            regions[:, 2:] += margin
+            tiles = tile_grid(image.shape[1], image.shape[0], self.tile_size, self.tile_overlap)
+            overlap = boxes_intersect(tiles, regions)
+            priority = np.where(overlap, detections[None, :, 4], -1.0).max(axis=1) # 타일과 겹치는 후보 중 가장 높은 점수
+            order = np.argsort(-priority)[:min(int(overlap.any(axis=1).sum()), self.max_tiles)]
+            for x1, y1, x2, y2 in tiles[order]:
+                crops.append(image[y1:y2, x1:x2])
+                owners.append(i)
+                origins.append((x1, y1))
+        if crops:
+            for owner, (x1, y1), detections in zip(owners, origins, self.backend.predict(crops)):
+                detections = detections.copy()
+                detections[:, [0, 2]] += x1
+                detections[:, [1, 3]] += y1
+                merged[owner].append(detections)
+        results = []
+        for image, parts in zip(images, merged):
+            detections = merge_detections(np.concatenate(parts), self.backend.iou)
+            detections[:, :4] /= np.array([image.shape[1] / width, image.shape[0] / height] * 2, dtype=np.float32)
+            results.append(detections)
+        return results
+
+
+    def reuse_detections(self, ip_address):
+        # 추론을 건너뛴 프레임: 마지막 탐지 결과를 이번 프레임 결과로 보고 추적 상태를 갱신
+        self.ensure_session(ip_address)
+        return self.update_session(ip_address, self.sessions[ip_address]['last'])
+
+
+    def update_session(self, ip_address, detections):
+        # 한 프레임의 탐지 결과(detections: (N, 6) [x1, y1, x2, y2, conf, cls])로 해당 IP의 추적 상태를 갱신하고 낙상 확정 여부를 반환
+        self.ensure_session(ip_address) # 세션 준비
+        session = self.sessions[ip_address]
+        session['last'] = detections
+        session['track_ids'] = track_ids = np.zeros(len(detections), dtype=np.uint32)
+        session['confirmed'] = -1
+        dic = session['dic']
         for rec in dic.values():
             rec[2] += 1 # 프레임 생존 시간 증가 (cleanup 기준에 사용됨)
-        result = self.model.predict(
-            frame,
-            iou=0.1, # IOU 임계값 (겹침 판단 기준 낮게 설정)
-            half=True, # FP16 모드 사용 (속도 향상)
-            conf=0.3, # Confidence threshold
-            verbose=False,
-            device=0 # GPU 0번 사용
-        )
-        boxes = result[0].boxes.cpu().numpy()
-        num = boxes.cls.size # 탐지된 객체 수
+        num = len(detections) # 탐지된 객체 수
 
         if num == 0:
             self.cleanup(ip_address) # 아무것도 탐지 안 됐으면 세션 정리
             return 0, 0, 0
         
         # 클래스(label)과 중심 좌표 (xywh) 추출
-        classes = boxes.cls.astype(int) # 클래스 인덱스 (ex. 낙상 여부)
-        xywh = boxes.xywh[:, :2].astype(int) # 중심좌표 (x, y)
+        classes = detections[:, 5].astype(int) # 클래스 인덱스 (ex. 낙상 여부)
+        xywh = ((detections[:, :2] + detections[:, 2:4]) / 2).astype(int) # 중심좌표 (x, y)
 
         for i in range(num):
             # 개별 객체에 대해 추적 및 상태 판단
             move_stack, obj_id = self.detect_dic(xywh[i], classes[i], ip_address)
+            track_ids[i] = obj_id
             if move_stack == 6:
                 # 낙상 누적이 6회 이상이면 감지 완료로 판단
+                session['confirmed'] = i
                 x, y = int(xywh[i][0]), int(xywh[i][1])
                 self.cleanup(ip_address) # 현재 프레임에서 세션 정리
                 return x, y, 1# 감지 종료
@@ -1,27 +1,362 @@
 import numpy as np
 import cv2
+import time
+import threading
+import queue
+from Debug_Viewer import DebugViewer
 from Detection_Model import YoloImageDetector
-from typing import Any
+from Detection_Results import DetectionResultQueue, detection_records
+from Frame_Ring import FrameRingReader, ring_name
+from typing import Any, Callable, Dict, List, Optional
+
+
+class DetectionScheduler:
+    '''
+    추론 시간을 재서 드론별 탐지 주기(초당 탐지 횟수)와 프레임 간격(stride)을 정하는 스케줄러.
+    - 프레임 한 장당 추론 시간을 EMA로 재고, 탐지 스레드가 cpu_budget 비율(1.0 = 쉬지 않고 추론)만 쓰도록 초당 처리할 전체 프레임 수를 정함.
+    - latency_budget(초)을 주면 수신 → 탐지 완료 지연의 EMA가 이를 넘는 동안 전체 프레임 수를 줄이고, 여유가 생기면 다시 늘림.
+    - 전체 프레임 수를 드론 상태별 가중치로 나눔: 낙상 후보 트랙이 있는 드론은 높게, 아무것도 안 보이는 드론은 낮게.
+    - stride는 드론 영상 fps(source_fps) 중 몇 프레임마다 한 번 탐지하는지를 뜻함 (지표용).
+    - 시각은 모두 time.monotonic() 기준 (시스템 시계가 바뀌어도 탐지 주기가 튀지 않게 함).
+    '''
+    WEIGHTS = {'candidate': 4.0, 'tracking': 1.0, 'idle': 0.5} #드론 상태별 탐지 주기 가중치
+
+    def __init__(self, ips: List[str], cpu_budget: float = 0.8, latency_budget: Optional[float] = None,
+                 min_rate: float = 1.0, max_rate: float = 30.0, source_fps: float = 30.0, alpha: float = 0.2) -> None:
+        self.cpu_budget = cpu_budget
+        self.latency_budget = latency_budget
+        self.min_rate = min_rate
+        self.max_rate = max_rate
+        self.source_fps = source_fps
+        self.alpha = alpha #EMA 계수 (클수록 최근 값을 많이 반영)
+        self.lock = threading.Lock() #드론별 탐지 스레드가 여러 개일 때 동시에 갱신함
+        self.frame_cost: Optional[float] = None #프레임 한 장당 추론 시간 EMA(초)
+        self.latency: Optional[float] = None #수신 → 탐지 완료 지연 EMA(초)
+        self.scale = 1.0 #지연 예산을 넘으면 줄어드는 전체 처리량 배율
+        self.states: Dict[str, str] = {}
+        self.rates: Dict[str, float] = {} #드론별 초당 탐지 횟수
+        self.last_run: Dict[str, float] = {}
+        self.deferred: Dict[str, float] = {} #프레임이 없어서 차례를 넘긴 드론의 다음 확인 시각 (영상이 끊긴 드론이 다른 드론의 탐지를 막지 않게 함)
+        self.achieved: Dict[str, float] = {} #실제 탐지 주기 EMA(Hz)
+        self.processed: Dict[str, int] = {}
+        self.register(ips)
+
+    def register(self, ips: List[str]) -> None: #탐지할 드론 추가 (디텍션 프로세스는 링을 열 때 드론 목록을 알게 됨)
+        with self.lock:
+            for ip in ips:
+                if ip not in self.states:
+                    self.states[ip] = 'idle'
+                    self.rates[ip] = self.max_rate
+                    self.last_run[ip] = 0.0
+                    self.deferred[ip] = 0.0
+                    self.achieved[ip] = 0.0
+                    self.processed[ip] = 0
+            self._update_rates()
+
+    def seed(self, frame_cost: float) -> None: #warm-up에서 잰 추론 시간으로 시작값을 잡음
+        with self.lock:
+            self.frame_cost = frame_cost
+            self._update_rates()
+
+    def observe(self, ips: List[str], inference_time: float, latencies: List[float]) -> None: #한 번의 추론(단일 또는 배치) 결과를 반영
+        now = time.monotonic() - inference_time #탐지 주기는 추론을 시작한 시각 기준으로 맞춤
+        with self.lock:
+            cost = inference_time / max(len(ips), 1)
+            self.frame_cost = cost if self.frame_cost is None else self.frame_cost + self.alpha * (cost - self.frame_cost)
+            for latency in latencies:
+                self.latency = latency if self.latency is None else self.latency + self.alpha * (latency - self.latency)
+            if self.latency_budget is not None and self.latency is not None:
+                self.scale = max(self.scale * 0.9, 0.1) if self.latency > self.latency_budget else min(self.scale * 1.05, 1.0)
+            for ip in ips:
+                if self.last_run[ip]:
+                    hz = 1.0 / max(now - self.last_run[ip], 1e-6)
+                    self.achieved[ip] += self.alpha * (hz - self.achieved[ip])
+                self.last_run[ip] = now
+                self.processed[ip] += 1
+            self._update_rates()
+
+    def set_state(self, ip: str, state: str) -> None: #'candidate' | 'tracking' | 'idle'
+        if self.states[ip] != state:
+            with self.lock:
+                self.states[ip] = state
+                self._update_rates()
+
+    def _update_rates(self) -> None:
+        if not self.frame_cost:
+            return
+        total = self.cpu_budget / self.frame_cost * self.scale #초당 처리할 수 있는 전체 프레임 수
+        weights = {ip: self.WEIGHTS[state] for ip, state in self.states.items()}
+        weight_sum = sum(weights.values())
+        for ip, weight in weights.items():
+            self.rates[ip] = min(max(total * weight / weight_sum, self.min_rate), self.max_rate)
+
+    def next_due(self, ip: str) -> float:
+        return max(self.last_run[ip] + 1.0 / self.rates[ip], self.deferred[ip])
+
+    def defer(self, ips: List[str]) -> None: #차례가 됐지만 프레임이 오지 않은 드론은 탐지 주기 한 번만큼 미룸 (achieved/processed에는 반영 안 함)
+        now = time.monotonic()
+        with self.lock:
+            for ip in ips:
+                self.deferred[ip] = now + 1.0 / self.rates[ip]
+
+    def frame_timeout(self, ips: List[str], due: List[str], limit: float = 1.0) -> float: #차례가 된 드론의 프레임을 기다려도 되는 시간: 나머지 드론의 다음 차례까지 (모두 차례면 limit)
+        others = [self.next_due(ip) for ip in ips if ip not in due]
+        return max(min(min(others, default=float('inf')) - time.monotonic(), limit), 0.0)
+
+    def wait_turn(self, ip: str) -> None: #이 드론의 다음 탐지 시각까지 대기
+        delay = self.next_due(ip) - time.monotonic()
+        if delay > 0:
+            time.sleep(delay)
+
+    def wait_due(self, ips: List[str]) -> List[str]: #한 대라도 탐지할 차례가 될 때까지 대기한 뒤, 차례가 된 드론 목록을 반환
+        delay = min(self.next_due(ip) for ip in ips) - time.monotonic()
+        if delay > 0:
+            time.sleep(delay)
+        now = time.monotonic()
+        return [ip for ip in ips if self.next_due(ip) <= now]
+
+    def snapshot(self) -> Dict[str, Dict]:
+        with self.lock:
+            return {ip: {
+                'state': self.states[ip],
+                'rate_hz': self.rates[ip],
+                'stride': max(1, round(self.source_fps / self.rates[ip])),
+                'achieved_hz': self.achieved[ip],
+                'processed': self.processed[ip],
+                'inference_ms': self.frame_cost * 1000 if self.frame_cost else None,
+                'latency_ms': self.latency * 1000 if self.latency is not None else None,
+                'scale': self.scale,
+            } for ip in self.states}
+
+
+class MotionGate:
+    '''
+    마지막으로 추론한 프레임과 비교해서 장면이 거의 그대로면 추론을 건너뛰게 하는 드론별 사전 필터.
+    - 프레임을 size로 줄이고 그레이로 바꾼 뒤, 평균 절대 차이(0~255)가 threshold 이하면 "변화 없음"으로 봄.
+    - 비교 기준은 마지막으로 추론한 프레임이라서, 천천히 변하는 장면도 차이가 쌓이면 결국 추론함.
+    - max_skip 프레임 연속으로 건너뛰면 변화가 없어도 한 번은 추론함.
+    '''
+    def __init__(self, threshold: float = 4.0, size: tuple = (64, 36), max_skip: int = 15) -> None:
+        self.threshold = threshold
+        self.size = size
+        self.max_skip = max_skip
+        self.references: Dict[str, np.ndarray] = {} #드론별 마지막으로 추론한 프레임의 축소 그레이 이미지
+        self.skip_runs: Dict[str, int] = {} #연속으로 건너뛴 프레임 수
+        self.checked: Dict[str, int] = {}
+        self.skipped: Dict[str, int] = {}
+
+    def signature(self, frame: np.ndarray) -> np.ndarray:
+        #854x480 → 64x36처럼 정수배가 아닌 INTER_AREA 축소는 1ms 넘게 걸리므로, 2배 크기까지 선형 보간으로 줄인 뒤 2x2 평균 (약 0.06ms)
+        #먼저 줄이고 그레이 변환 (변환할 픽셀 수를 줄임)
+        small = cv2.resize(frame, (self.size[0] * 2, self.size[1] * 2), interpolation=cv2.INTER_LINEAR)
+        small = cv2.resize(small, self.size, interpolation=cv2.INTER_AREA)
+        return cv2.cvtColor(small, cv2.COLOR_BGR2GRAY).astype(np.int16)
+
+    def should_infer(self, ip: str, frame: np.ndarray, force: bool = False) -> bool:
+        #True면 추론, False면 이전 탐지 결과를 재사용. force면 비교 없이 추론 (낙상 후보 트랙이 있을 때 등)
+        self.checked[ip] = self.checked.get(ip, 0) + 1
+        signature = self.signature(frame)
+        reference = self.references.get(ip)
+        if (not force and reference is not None and self.skip_runs.get(ip, 0) < self.max_skip
+                and np.abs(signature - reference).mean() <= self.threshold):
+            self.skip_runs[ip] = self.skip_runs.get(ip, 0) + 1
+            self.skipped[ip] = self.skipped.get(ip, 0) + 1
+            return False
+        self.references[ip] = signature
+        self.skip_runs[ip] = 0
+        return True
+
+    def skip_ratio(self, ip: str) -> float:
+        return self.skipped.get(ip, 0) / max(self.checked.get(ip, 0), 1)
+
+
+def format_detection_snapshot(ip: str, snap: Dict) -> str:
+    #탐지 스케줄러 지표 한 줄 요약 (로그 출력용)
+    inference = snap['inference_ms']
+    latency = snap['latency_ms']
+    return (f"[Detection {ip}] {snap['state']} rate={snap['rate_hz']:.1f}Hz stride={snap['stride']} "
+            f"achieved={snap['achieved_hz']:.1f}Hz inference={inference if inference is None else round(inference, 1)}ms "
+            f"latency={latency if latency is None else round(latency, 1)}ms skip={snap.get('skip_ratio', 0.0) * 100:.0f}%")
+
 
 class DetectionPipeline:
-    def __init__(self, pipe : Any) -> None:
-        self.pipe = pipe
-        self.detector = YoloImageDetector() #객체 탐지 클래스를 선언
+    INPUT_SIZE = (854, 480) #모델이 학습된 입력 크기 (width, height). 디코더가 이 크기로 바로 변환해서 넘겨줌.
+    FULL_FRAME_SIZE = (960, 720) #Tello 원본 해상도. 타일 추론 모드에서는 디코더가 이 크기 그대로 넘겨줌
+    BATCH_WINDOW = 0.01 #배치 추론 시 첫 프레임이 온 뒤 다른 드론의 프레임을 더 기다리는 시간(초). 30fps 프레임 간격(33ms)보다 충분히 짧게
+
+    def __init__(self, pipe : Any, ips: Optional[List[str]] = None, scheduler_options: Optional[Dict] = None, motion_gate: Optional[MotionGate] = None, tiled: bool = False, cascade: bool = False, debug_viewer: Optional[DebugViewer] = None, results: Optional[DetectionResultQueue] = None, detector: Optional[YoloImageDetector] = None, precision: str = "auto") -> None:
+        self.pipe = pipe #낙상 확정 시 (str(x), str(y))를 보내는 예전 방식 출력 (None이면 안 씀)
+        self.results = results #프레임마다 탐지 결과 레코드(Detection_Results.DETECTION_RECORD)를 메인 프로세스로 넘기는 공유 메모리 큐
+        self.tiled = tiled #True면 원본 해상도 프레임을 받아서 관심 영역을 타일로 잘라 추가 추론 (YoloImageDetector.predict_tiled)
+        self.detector = detector if detector is not None else YoloImageDetector(tiled=tiled, input_size=self.INPUT_SIZE, cascade=cascade, precision=precision) #객체 탐지 클래스를 선언 (cascade면 사람 탐지 → 사람 crop만 낙상 분류, YoloImageDetector.classify_falls). 벤치마크 등에서 미리 만든 detector를 넘길 수도 있음. precision="int8"이면 CPU용 INT8 양자화 모델
+        self.scheduler = DetectionScheduler(ips or [], **(scheduler_options or {})) #추론 시간에 맞춰 드론별 탐지 주기를 정함 (DetectionScheduler 참고)
+        self.motion_gate = motion_gate if motion_gate is not None else MotionGate() #장면 변화가 없으면 추론을 건너뜀 (끄려면 threshold를 음수로)
+        self.debug_viewer = debug_viewer #탐지 결과를 그린 프레임을 띄우는 디버그 뷰어 (None이면 끔, 켜도 속도 제한된 최신 프레임만 넘기고 바로 돌아옴)
+        self.frame_latency = {} #IP별 마지막 프레임의 수신 → 탐지 완료까지 걸린 시간(초)
+        self.torn_frames = {} #공유 메모리 링에서 탐지 도중 덮어써진 프레임 수
+        self.event_callbacks : List[Callable[[str, float], None]] = [] #낙상이 확정됐을 때 (IP, 프레임 수신 시각)으로 호출할 함수들 (예: 클립 저장)
         pass
     
+    def warmup(self, batch_size: int = 1) -> None: #영상이 들어오기 전에 모델 입력 크기로 추론을 미리 돌려서 첫 탐지가 늦어지지 않게 함
+        batch_size = max(batch_size, 1) #드론 목록이 비어 있어도 1장 기준으로 데우고 탐지 주기를 정함 (0이면 warm_ms_batch0 키가 없음)
+        width, height = self.frame_size()
+        startup_times = self.detector.warmup((height, width, 3), sorted({1, max(batch_size, 2)})) #드론이 1대여도 2장 배치를 돌려서 배치를 못 받는 모델이면 시작할 때 바로 드러나게 함
+        self.scheduler.seed(startup_times[f'warm_ms_batch{batch_size}'] / 1000 / batch_size) #첫 프레임부터 추론 시간에 맞는 탐지 주기로 시작
+
+    def track_state(self, ip: str) -> str: #스케줄러 가중치용 드론 상태: 낙상 누적 중인 트랙이 있으면 'candidate', 추적 중인 객체만 있으면 'tracking', 없으면 'idle'
+        tracks = self.detector.sessions.get(ip, {}).get('dic', {})
+        if any(rec[1] > 0 for rec in tracks.values()):
+            return 'candidate'
+        return 'tracking' if tracks else 'idle'
+
+    def frame_size(self) -> tuple: #디코더가 넘겨줘야 하는 프레임 크기 (width, height)
+        return self.FULL_FRAME_SIZE if self.tiled else self.INPUT_SIZE
+
     def image_preprocessing(self, frame: np.ndarray) -> np.ndarray:
-        return cv2.resize(frame, (854, 480), interpolation=cv2.INTER_CUBIC) #이미지를 전처리(리사이징)을 하는 부분.(모델의 훈련 부분이 오직 리사이즈만 시행했기 때문에 이 이상은 전처리 못함.)
+        if self.tiled or frame.shape[1::-1] == self.INPUT_SIZE: #디코더에서 이미 모델 입력 크기로 변환된 프레임이면 그대로 사용 (타일 모드는 원본 해상도가 필요하므로 그대로)
+            return frame
+        return cv2.resize(frame, self.INPUT_SIZE, interpolation=cv2.INTER_CUBIC) #이미지를 전처리(리사이징)을 하는 부분.(모델의 훈련 부분이 오직 리사이즈만 시행했기 때문에 이 이상은 전처리 못함.)
     
     
-    def detect_objects(self, frame: np.ndarray, source_ip: str) -> None:
+    def detect_objects(self, frame: np.ndarray, source_ip: str, capture_ts: float = 0.0) -> bool:
         x, y, ret = self.detector.predict_image(frame, source_ip) #객체 탐지지
+        self.handle_result(x, y, ret, source_ip, capture_ts)
+        return bool(ret)
+
+    def handle_result(self, x: int, y: int, ret: int, source_ip: str, capture_ts: float) -> None: #탐지 결과 하나를 처리 (메인 전송, 이벤트 콜백, 지연 기록)
+        if self.results is not None: #이번 프레임의 박스 전부를 레코드로 보냄 (낙상 확정 여부는 confirmed 필드)
+            session = self.detector.sessions[source_ip]
+            self.results.put(detection_records(source_ip, capture_ts or time.time(), session['last'], session['track_ids'], session['confirmed']))
         if ret:
-            self.pipe.send((str(x),str(y)))
-            
-            
-        #cv2.imshow(source_ip, frame)
-        #cv2.waitKey(1)
+            if self.pipe is not None:
+                self.pipe.send((str(x),str(y)))
+            for callback in self.event_callbacks:
+                callback(source_ip, capture_ts)
+        if capture_ts:
+            self.frame_latency[source_ip] = time.time() - capture_ts
+
+    def show_debug(self, source_ip: str, frame: np.ndarray) -> None: #디버그 뷰어가 켜져 있으면 마지막 탐지 결과와 함께 프레임을 넘김
+        if self.debug_viewer is not None:
+            self.debug_viewer.submit(source_ip, frame, self.detector.sessions[source_ip]['last'])
     
-    def process_frame(self, frame: np.ndarray, source_ip: str) -> None: #이미지 전처리와 객체 탐지를 수행시키는 부분.(Get_Video파일에서 while True로 계속해서 작동됨.)
+    def process_frame(self, frame: np.ndarray, source_ip: str, capture_ts: float = 0.0) -> None: #이미지 전처리와 객체 탐지를 수행시키는 부분.(Get_Video파일에서 while True로 계속해서 작동됨.)
+        start = time.monotonic()
         frame = self.image_preprocessing(frame) 
-        self.detect_objects(frame, source_ip)
+        if not self.motion_gate.should_infer(source_ip, frame, self.track_state(source_ip) == 'candidate'): #장면이 그대로면 이전 탐지 결과를 재사용
+            x, y, ret = self.detector.reuse_detections(source_ip)
+            self.handle_result(x, y, ret, source_ip, capture_ts)
+            self.show_debug(source_ip, frame)
+            return
+        self.detect_objects(frame, source_ip, capture_ts)
+        self.scheduler.observe([source_ip], time.monotonic() - start, [self.frame_latency[source_ip]] if capture_ts else [])
+        self.scheduler.set_state(source_ip, self.track_state(source_ip))
+        self.show_debug(source_ip, frame)
+
+    def process_batch(self, frames: List[np.ndarray], source_ips: List[str], capture_ts: List[float]) -> None: #여러 드론의 프레임을 model.predict 한 번으로 탐지하고 결과를 IP별로 처리
+        start = time.monotonic()
+        frames = [self.image_preprocessing(frame) for frame in frames]
+        infer = [self.motion_gate.should_infer(ip, frame, self.track_state(ip) == 'candidate') for ip, frame in zip(source_ips, frames)]
+        for source_ip, frame, ts, needed in zip(source_ips, frames, capture_ts, infer): #장면이 그대로인 드론은 이전 탐지 결과를 재사용
+            if not needed:
+                x, y, ret = self.detector.reuse_detections(source_ip)
+                self.handle_result(x, y, ret, source_ip, ts)
+                self.show_debug(source_ip, frame)
+        source_ips = [ip for ip, needed in zip(source_ips, infer) if needed]
+        capture_ts = [ts for ts, needed in zip(capture_ts, infer) if needed]
+        frames = [frame for frame, needed in zip(frames, infer) if needed]
+        if not source_ips:
+            return
+        results = self.detector.predict_batch(frames, source_ips)
+        for (x, y, ret), source_ip, ts in zip(results, source_ips, capture_ts):
+            self.handle_result(x, y, ret, source_ip, ts)
+        self.scheduler.observe(source_ips, time.monotonic() - start, [self.frame_latency[ip] for ip, ts in zip(source_ips, capture_ts) if ts])
+        for source_ip, frame in zip(source_ips, frames):
+            self.scheduler.set_state(source_ip, self.track_state(source_ip))
+            self.show_debug(source_ip, frame)
+
+    def metrics_snapshot(self) -> Dict[str, Dict]: #드론별 탐지 지표 (스케줄러 + 장면 변화 필터)
+        snapshot = self.scheduler.snapshot()
+        for ip, snap in snapshot.items():
+            snap['skip_ratio'] = self.motion_gate.skip_ratio(ip)
+            snap['gate_skipped'] = self.motion_gate.skipped.get(ip, 0)
+        return snapshot
+
+
+    def ring_worker(self, ip: str) -> None: #디코더 프로세스가 공유 메모리 링에 쓴 프레임을 복사 없이 읽어서 탐지하는 부분
+        reader = FrameRingReader(ring_name(ip)) #디코더 프로세스가 링을 만들 때까지 기다렸다가 붙음
+        self.torn_frames[ip] = 0
+        try:
+            while True:
+                self.scheduler.wait_turn(ip) #스케줄러가 정한 이 드론의 탐지 시각까지 대기
+                seq, frame, capture_ts, source_ip = reader.wait_latest() #가장 최근 프레임 (이전 프레임을 다 못 읽었어도 최신 것으로 건너뜀)
+                self.process_frame(frame, source_ip, capture_ts)
+                if not reader.is_valid(seq): #탐지하는 동안 디코더가 같은 슬롯을 덮어씀
+                    self.torn_frames[ip] += 1
+        except Exception as e:
+            print(f"[Ring Detection {ip} Error] {e}")
+
+
+    def ring_batch_worker(self, ips: List[str], poll_interval: float = 0.002) -> None: #모든 드론의 링에서 최신 프레임을 모아 한 번에 탐지하는 부분
+        readers = {ip: FrameRingReader(ring_name(ip)) for ip in ips}
+        for ip in ips:
+            self.torn_frames[ip] = 0
+        try:
+            while True:
+                due = self.scheduler.wait_due(ips) #탐지할 차례가 된 드론만 모음
+                if not due:
+                    continue
+                timeout = time.monotonic() + self.scheduler.frame_timeout(ips, due) #영상이 끊긴 드론을 다른 드론의 차례가 올 때까지만 기다림
+                batch = {} #ip → (프레임 번호, 프레임 뷰, 수신 시각, 드론 IP)
+                deadline = None
+                while len(batch) < len(due): #첫 프레임이 온 뒤 BATCH_WINDOW 동안만 나머지 드론을 기다림
+                    for ip in due:
+                        if ip not in batch:
+                            item = readers[ip].latest()
+                            if item is not None:
+                                batch[ip] = item
+                    now = time.monotonic()
+                    if batch and deadline is None:
+                        deadline = now + self.BATCH_WINDOW
+                    if len(batch) == len(due) or (deadline is not None and now >= deadline) or (not batch and now >= timeout):
+                        break
+                    time.sleep(poll_interval)
+                missing = [ip for ip in due if ip not in batch]
+                if missing: #프레임이 없는 드론은 다음 주기로 미루고 온 드론만 탐지
+                    self.scheduler.defer(missing)
+                if not batch:
+                    continue
+                items = list(batch.items())
+                self.process_batch([item[1] for _, item in items], [item[3] for _, item in items], [item[2] for _, item in items])
+                for ip, item in items:
+                    if not readers[ip].is_valid(item[0]): #탐지하는 동안 디코더가 같은 슬롯을 덮어씀
+                        self.torn_frames[ip] += 1
+        except Exception as e:
+            print(f"[Ring Batch Detection Error] {e}")
+
+
+    def metrics_reporter(self, metrics_queue: Any = None, interval: float = 5.0) -> None: #스케줄러 지표를 주기적으로 메인 프로세스로 보냄 (큐가 없으면 출력만 함)
+        while True:
+            time.sleep(interval)
+            snapshot = self.metrics_snapshot()
+            if metrics_queue is not None:
+                try:
+                    metrics_queue.put_nowait({ip: {'detection': snap} for ip, snap in snapshot.items()})
+                except queue.Full:
+                    pass
+            else:
+                for ip, snap in snapshot.items():
+                    print(format_detection_snapshot(ip, snap))
+
+
+    def run_frame_rings(self, ips: List[str], batched: bool = True, metrics_queue: Any = None) -> None: #드론별 링을 읽는 스레드를 띄우고 끝날 때까지 대기 (디텍션 전용 프로세스에서 호출)
+        self.scheduler.register(ips)
+        self.warmup(len(ips) if batched else 1)
+        threading.Thread(target=self.metrics_reporter, args=(metrics_queue,), daemon=True).start()
+        if batched: #드론 프레임을 모아 한 번에 추론 (드론이 여러 대일 때 predict 호출 오버헤드를 한 번만 냄)
+            threads = [threading.Thread(target=self.ring_batch_worker, args=(ips,))]
+        else:
+            threads = [threading.Thread(target=self.ring_worker, args=(ip,)) for ip in ips]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
@@ -0,0 +1,139 @@
+import threading
+import numpy as np
+from multiprocessing import shared_memory
+from typing import List, Optional
+from Frame_Ring import attach_shared_memory
+
+# 탐지 결과 레코드 (64바이트): 프레임 하나의 박스 하나. confirmed는 이 박스로 낙상이 확정된 프레임이면 1
+DETECTION_RECORD = np.dtype([
+    ('capture_ts', '<f8'), # 프레임 수신 시각 (time.time())
+    ('ip', 'S16'), # 드론 IP
+    ('track_id', '<u4'), # YoloImageDetector 세션의 객체 ID (0 = 낙상 확정 후 정리되어 ID를 받지 못한 박스)
+    ('cls', 'u1'), # 클래스 (1 = 낙상)
+    ('confirmed', 'u1'),
+    ('pad', 'u1', 2),
+    ('conf', '<f4'),
+    ('box', '<f4', 4), # [x1, y1, x2, y2] (탐지 입력 크기 854x480 기준)
+    ('pad2', 'u1', 12),
+])
+# 큐 헤더 (64바이트): write_seq는 쓰는 쪽만, read_seq는 읽는 쪽만 갱신함 (단일 생산자/단일 소비자)
+QUEUE_HEADER = np.dtype([
+    ('write_seq', '<u8'),
+    ('read_seq', '<u8'),
+    ('capacity', '<u4'),
+    ('pad0', 'u1', 4),
+    ('dropped', '<u8'), # 큐가 가득 차서 버린 레코드 수 (프레임 단위로 버리므로 그 프레임의 레코드 수만큼 늘어남)
+    ('pad', 'u1', 32),
+])
+
+
+def results_name(key: str) -> str:
+    # 생산자(영상 프로세스 이름 또는 "detection")별 공유 메모리 이름
+    return "tello_results_" + key
+
+
+def detection_records(ip: str, capture_ts: float, detections: np.ndarray, track_ids: np.ndarray, confirmed: int = -1) -> np.ndarray:
+    # 프레임 하나의 (N, 6) 탐지 결과 → DETECTION_RECORD 배열. confirmed: 낙상이 확정된 박스의 인덱스 (-1이면 없음)
+    records = np.zeros(len(detections), dtype=DETECTION_RECORD)
+    records['capture_ts'] = capture_ts
+    records['ip'] = ip.encode()
+    records['track_id'] = track_ids
+    records['cls'] = detections[:, 5]
+    records['conf'] = detections[:, 4]
+    records['box'] = detections[:, :4]
+    if confirmed >= 0:
+        records['confirmed'][confirmed] = 1
+    return records
+
+
+class DetectionResultQueue:
+    '''
+    탐지 결과 레코드를 다른 프로세스로 넘기는 공유 메모리 큐 (단일 생산자/단일 소비자 링).
+    - 메인 프로세스가 create=True로 만들고, 탐지하는 프로세스는 같은 이름으로 붙어서 put()만 함.
+    - 레코드는 고정 크기 numpy 구조체라서 pickle 없이 배열째로 쓰고, get_batch()로 쌓인 것을 한 번에 읽음.
+    - put()은 읽는 쪽을 기다리지 않음: 한 프레임의 레코드가 다 들어갈 자리가 없으면 그 프레임을 통째로 버리고 dropped에 셈
+      (일부만 넣으면 읽는 쪽이 박스가 빠진 프레임을 온전한 결과로 보게 됨).
+    '''
+    def __init__(self, name: str, capacity: int = 4096, create: bool = False) -> None:
+        self.create = create
+        if create:
+            size = QUEUE_HEADER.itemsize + capacity * DETECTION_RECORD.itemsize
+            try:
+                self.shm = shared_memory.SharedMemory(name=name, create=True, size=size)
+            except FileExistsError: # 이전 실행에서 남은 큐면 지우고 다시 만듦
+                old = shared_memory.SharedMemory(name=name)
+                old.close()
+                old.unlink()
+                self.shm = shared_memory.SharedMemory(name=name, create=True, size=size)
+        else:
+            self.shm = attach_shared_memory(name)
+        self.header = np.ndarray((), dtype=QUEUE_HEADER, buffer=self.shm.buf, offset=0)
+        if create:
+            self.header['write_seq'] = self.header['read_seq'] = self.header['dropped'] = 0
+            self.header['capacity'] = capacity
+        self.capacity = int(self.header['capacity'])
+        self.records = np.ndarray((self.capacity,), dtype=DETECTION_RECORD, buffer=self.shm.buf, offset=QUEUE_HEADER.itemsize)
+        self.lock = threading.Lock() # 드론별 탐지 스레드가 여러 개면 같은 프로세스 안에서 쓰는 쪽이 여럿이 됨
+
+    def put(self, records: np.ndarray) -> int:
+        # 프레임 하나의 레코드를 큐에 넣고 넣은 개수를 반환 (전부 들어갈 자리가 없으면 하나도 넣지 않고 0)
+        with self.lock:
+            write_seq = int(self.header['write_seq'])
+            count = len(records)
+            if count > self.capacity - (write_seq - int(self.header['read_seq'])):
+                self.header['dropped'] += count
+                return 0
+            start = write_seq % self.capacity
+            first = min(count, self.capacity - start) # 링 끝에서 잘리면 두 번에 나눠 씀
+            self.records[start:start + first] = records[:first]
+            self.records[:count - first] = records[first:count]
+            self.header['write_seq'] = write_seq + count # 레코드를 다 쓴 뒤에 공개
+            return count
+
+    def get_batch(self, max_items: Optional[int] = None) -> np.ndarray:
+        # 쌓인 레코드를 최대 max_items개까지 복사해서 반환 (없으면 빈 배열)
+        read_seq = int(self.header['read_seq'])
+        count = int(self.header['write_seq']) - read_seq
+        if max_items is not None:
+            count = min(count, max_items)
+        start = read_seq % self.capacity
+        first = min(count, self.capacity - start)
+        batch = np.concatenate([self.records[start:start + first], self.records[:count - first]])
+        self.header['read_seq'] = read_seq + count
+        return batch
+
+    def dropped(self) -> int:
+        return int(self.header['dropped'])
+
+    def close(self) -> None:
+        del self.header, self.records # 공유 메모리를 닫기 전에 numpy 뷰를 먼저 놓아줌
+        self.shm.close()
+        if self.create:
+            self.shm.unlink()
+
+
+def read_all(queues: List[DetectionResultQueue]) -> np.ndarray:
+    # 여러 생산자의 큐에 쌓인 레코드를 수신 시각 순으로 합쳐서 반환
+    batches = [queue.get_batch() for queue in queues]
+    records = np.concatenate(batches) if batches else np.zeros(0, dtype=DETECTION_RECORD)
+    return records[np.argsort(records['capture_ts'], kind='stable')]
+
+
+def legacy_detection(records: np.ndarray):
+    # 예전 파이프 메시지와 같은 형태: 마지막으로 낙상이 확정된 박스의 중심 (str(x), str(y)), 없으면 ''
+    confirmed = records[records['confirmed'] == 1]
+    if not len(confirmed):
+        return ''
+    box = confirmed[-1]['box']
+    return (str(int((box[0] + box[2]) / 2)), str(int((box[1] + box[3]) / 2)))
+
+
+def latest_fall_event(records: np.ndarray):
+    # GCS로 보낼 마지막 낙상 확정 레코드 요약 (드론 IP, 객체 ID, 수신 시각, confidence, [x1, y1, x2, y2]), 없으면 None
+    # GCS는 recv(1024)로 메시지 하나를 받으므로 레코드 전체가 아니라 한 건만 작은 튜플로 보냄
+    confirmed = records[records['confirmed'] == 1]
+    if not len(confirmed):
+        return None
+    record = confirmed[-1]
+    return (record['ip'].decode(), int(record['track_id']), float(record['capture_ts']), round(float(record['conf']), 3),
+            [int(v) for v in record['box']])
@@ -0,0 +1,51 @@
+import threading
+from typing import Any, Dict, List, Optional, Tuple
+
+
+class FrameMailbox:
+    '''
+    디코더와 디텍션 사이의 드론별 "최신 프레임 우선" 우편함.
+    - 디코더는 put()으로 항상 덮어쓰기만 하므로 디텍션이 느려도 절대 막히지 않음.
+    - 디텍션은 get()으로 가장 최근 프레임과 그 수신 시각을 가져감.
+    - 소비되기 전에 덮어써진 프레임 수를 드론별로 셈.
+    '''
+    def __init__(self, ips: List[str]) -> None:
+        self.cond = threading.Condition()
+        self.slots: Dict[str, Optional[Tuple[Any, float]]] = {ip: None for ip in ips} # (프레임, 수신 시각)
+        self.overwritten: Dict[str, int] = {ip: 0 for ip in ips} # 디텍션이 가져가기 전에 덮어써진 프레임 수
+        self.delivered: Dict[str, int] = {ip: 0 for ip in ips} # 디텍션이 가져간 프레임 수
+
+    def put(self, ip: str, frame: Any, capture_ts: float) -> None:
+        with self.cond:
+            if self.slots[ip] is not None:
+                self.overwritten[ip] += 1
+            self.slots[ip] = (frame, capture_ts)
+            self.cond.notify_all()
+
+    def get(self, ip: str, timeout: Optional[float] = None) -> Optional[Tuple[Any, float]]:
+        # 새 프레임이 올 때까지 기다렸다가 꺼냄 (timeout이 지나면 None)
+        with self.cond:
+            if not self.cond.wait_for(lambda: self.slots[ip] is not None, timeout):
+                return None
+            item = self.slots[ip]
+            self.slots[ip] = None
+            self.delivered[ip] += 1
+            return item
+
+    def get_batch(self, ips: List[str], window: float, timeout: Optional[float] = None) -> Dict[str, Tuple[Any, float]]:
+        '''
+        여러 드론의 최신 프레임을 한 번에 꺼냄 (배치 추론용).
+        - 어느 한 드론이라도 프레임이 오면, 나머지 드론을 최대 window초까지 더 기다렸다가 그때까지 온 것만 꺼냄.
+        - return: {ip: (프레임, 수신 시각)}. timeout 동안 아무 프레임도 없으면 빈 딕셔너리
+        '''
+        with self.cond:
+            if not self.cond.wait_for(lambda: any(self.slots[ip] is not None for ip in ips), timeout):
+                return {}
+            self.cond.wait_for(lambda: all(self.slots[ip] is not None for ip in ips), window)
+            items = {}
+            for ip in ips:
+                if self.slots[ip] is not None:
+                    items[ip] = self.slots[ip]
+                    self.slots[ip] = None
+                    self.delivered[ip] += 1
+            return items
@@ -0,0 +1,161 @@
+import threading
+import time
+import numpy as np
+from multiprocessing import shared_memory, resource_tracker
+from typing import Optional, Tuple
+
+# 링 전체 헤더 (64바이트): 마지막으로 다 쓴 프레임 번호와 슬롯 구성
+RING_HEADER = np.dtype([
+    ('write_seq', '<u8'),
+    ('slot_count', '<u4'),
+    ('height', '<u4'),
+    ('width', '<u4'),
+    ('channels', '<u4'),
+    ('pad', 'u1', 40),
+])
+# 슬롯 헤더 (64바이트): seq는 seqlock으로 사용 (홀수 = 쓰는 중, 짝수 = 프레임 번호 * 2 로 쓰기 완료)
+SLOT_HEADER = np.dtype([
+    ('seq', '<u8'),
+    ('capture_ts', '<f8'),
+    ('ip', 'S16'),
+    ('pad', 'u1', 32),
+])
+
+
+def ring_name(ip: str) -> str:
+    # 드론 IP로 공유 메모리 이름을 만듦 (예: 192.168.0.99 → tello_frames_192_168_0_99)
+    return "tello_frames_" + ip.replace(".", "_")
+
+
+_attach_lock = threading.Lock() # attach_shared_memory가 resource_tracker.register를 잠깐 바꾸는 동안 다른 스레드가 붙지 않게 함
+
+
+def attach_shared_memory(name: str) -> shared_memory.SharedMemory:
+    '''
+    다른 프로세스가 만든 공유 메모리를 붙임. 정리(unlink)는 만든 쪽만 하도록 붙인 쪽은 resource_tracker에 아예 등록하지 않음.
+    - Python 3.13+는 track=False.
+    - 그 이전에는 열 때 항상 등록되는데, 나중에 unregister하면 같은 tracker를 쓰는 자식 프로세스(spawn/fork)에서는
+      만든 쪽의 등록까지 지워져서, 만든 쪽이 정리할 때 KeyError가 나고 만든 쪽이 죽으면 메모리가 남음.
+      그래서 여는 동안만 shared_memory 등록을 건너뜀.
+    '''
+    try:
+        return shared_memory.SharedMemory(name=name, track=False) # Python 3.13+
+    except TypeError:
+        pass
+    with _attach_lock:
+        register = resource_tracker.register
+        resource_tracker.register = lambda resource, rtype: None if rtype == "shared_memory" else register(resource, rtype)
+        try:
+            return shared_memory.SharedMemory(name=name)
+        finally:
+            resource_tracker.register = register
+
+
+class SharedFrameRing:
+    '''
+    드론 한 대의 디코딩된 프레임을 다른 프로세스로 넘기는 공유 메모리 링 버퍼 (쓰는 쪽).
+    - 고정 크기 슬롯 N개를 돌아가며 덮어쓰고, 슬롯마다 프레임 번호/수신 시각/드론 IP를 헤더에 기록함.
+    - 읽는 쪽을 기다리지 않으므로 디텍션 프로세스가 늦어도 디코더는 막히지 않음.
+    '''
+    def __init__(self, name: str, frame_shape: Tuple[int, int, int], slot_count: int = 4) -> None:
+        height, width, channels = frame_shape
+        self.slot_count = slot_count
+        self.frame_bytes = height * width * channels
+        size = RING_HEADER.itemsize + slot_count * (SLOT_HEADER.itemsize + self.frame_bytes)
+        try:
+            self.shm = shared_memory.SharedMemory(name=name, create=True, size=size)
+        except FileExistsError: # 이전 실행에서 남은 링이면 지우고 다시 만듦
+            old = shared_memory.SharedMemory(name=name)
+            old.close()
+            old.unlink()
+            self.shm = shared_memory.SharedMemory(name=name, create=True, size=size)
+        self.header, self.slot_headers, self.frames = map_ring(self.shm, slot_count, frame_shape)
+        self.slot_headers['seq'] = 0
+        self.header['write_seq'] = 0
+        self.header['slot_count'] = slot_count
+        self.header['height'], self.header['width'], self.header['channels'] = height, width, channels
+
+    def write(self, frame: np.ndarray, capture_ts: float, ip: str) -> int:
+        seq = int(self.header['write_seq']) + 1
+        slot = seq % self.slot_count
+        header = self.slot_headers[slot]
+        header['seq'] = 2 * seq - 1 # 쓰는 중 표시 (읽는 쪽은 이 슬롯을 무시함)
+        np.copyto(self.frames[slot], frame)
+        header['capture_ts'] = capture_ts
+        header['ip'] = ip.encode()
+        header['seq'] = 2 * seq # 쓰기 완료
+        self.header['write_seq'] = seq
+        return seq
+
+    def close(self) -> None:
+        del self.header, self.slot_headers, self.frames # 공유 메모리를 닫기 전에 numpy 뷰를 먼저 놓아줌
+        self.shm.close()
+        self.shm.unlink()
+
+
+def map_ring(shm: shared_memory.SharedMemory, slot_count: int, frame_shape: Tuple[int, int, int]):
+    # 공유 메모리 위에 (링 헤더, 슬롯 헤더 배열, 프레임 배열) numpy 뷰를 만듦 (복사 없음)
+    offset = RING_HEADER.itemsize
+    header = np.ndarray((), dtype=RING_HEADER, buffer=shm.buf, offset=0)
+    slot_headers = np.ndarray((slot_count,), dtype=SLOT_HEADER, buffer=shm.buf, offset=offset)
+    offset += slot_count * SLOT_HEADER.itemsize
+    frames = np.ndarray((slot_count,) + tuple(frame_shape), dtype=np.uint8, buffer=shm.buf, offset=offset)
+    return header, slot_headers, frames
+
+
+class FrameRingReader:
+    '''
+    SharedFrameRing을 읽는 쪽. 항상 가장 최근에 다 쓴 프레임을 복사 없이 numpy 뷰로 돌려줌.
+    - 뷰는 쓰는 쪽이 같은 슬롯을 다시 덮어쓰기 전까지만 유효하므로, 다 쓴 뒤 is_valid()로 확인해야 함.
+    - 늦게 읽어서 놓친 프레임 수는 skipped에 누적됨.
+    '''
+    def __init__(self, name: str, timeout: Optional[float] = None) -> None:
+        start = time.time()
+        while True: # 쓰는 쪽(디코더 프로세스)이 링을 만들 때까지 기다림
+            try:
+                self.shm = attach_shared_memory(name)
+                break
+            except FileNotFoundError:
+                if timeout is not None and time.time() - start > timeout:
+                    raise
+                time.sleep(0.1)
+        header = np.ndarray((), dtype=RING_HEADER, buffer=self.shm.buf, offset=0)
+        self.slot_count = int(header['slot_count'])
+        frame_shape = (int(header['height']), int(header['width']), int(header['channels']))
+        del header
+        self.header, self.slot_headers, self.frames = map_ring(self.shm, self.slot_count, frame_shape)
+        self.last_seq = int(self.header['write_seq']) # 붙은 시점 이후의 프레임부터 읽음
+        self.skipped = 0 # 읽기 전에 덮어써져서 놓친 프레임 수
+
+    def latest(self) -> Optional[Tuple[int, np.ndarray, float, str]]:
+        # 새 프레임이 있으면 (프레임 번호, 프레임 뷰, 수신 시각, 드론 IP), 없으면 None
+        seq = int(self.header['write_seq'])
+        if seq == self.last_seq:
+            return None
+        slot = seq % self.slot_count
+        header = self.slot_headers[slot]
+        if int(header['seq']) != 2 * seq: # 그 사이에 쓰는 쪽이 이 슬롯을 다시 쓰기 시작함 → 다음 호출에서 다시 시도
+            return None
+        capture_ts = float(header['capture_ts'])
+        ip = header['ip'].decode()
+        if int(header['seq']) != 2 * seq: # 헤더를 읽는 도중 덮어써졌으면 버림
+            return None
+        self.skipped += max(seq - self.last_seq - 1, 0)
+        self.last_seq = seq
+        return seq, self.frames[slot], capture_ts, ip
+
+    def wait_latest(self, poll_interval: float = 0.002) -> Tuple[int, np.ndarray, float, str]:
+        # 새 프레임이 올 때까지 짧게 쉬면서 기다림 (프로세스 간 알림이 없으므로 폴링)
+        while True:
+            item = self.latest()
+            if item is not None:
+                return item
+            time.sleep(poll_interval)
+
+    def is_valid(self, seq: int) -> bool:
+        # latest()로 받은 뷰가 아직 덮어써지지 않았는지 확인
+        return int(self.slot_headers[seq % self.slot_count]['seq']) == 2 * seq
+
+    def close(self) -> None:
+        del self.header, self.slot_headers, self.frames
+        self.shm.close()
@@ -3,13 +3,16 @@ import pickle
 import struct
 import threading
 import time
-from typing import Any, Dict, Optional, Union
+from typing import Any, Dict, List, Optional, Union
 from multiprocessing.sharedctypes import SynchronizedArray
+import numpy as np
+from Detection_Results import DetectionResultQueue, latest_fall_event, legacy_detection, read_all
 
 class GcsConnector:
-    def __init__(self, gcs_to_main_pipe: Any, main_to_video_pipe : Any, drone_location_array : SynchronizedArray, tello_location_array : SynchronizedArray, gcs_ip: str = '192.168.0.101', gcs_port: int = 5270, reconnect_delay: Union[int, float] = 5) -> None:
+    def __init__(self, gcs_to_main_pipe: Any, result_queues : List[DetectionResultQueue], drone_location_array : SynchronizedArray, tello_location_array : SynchronizedArray, gcs_ip: str = '192.168.0.101', gcs_port: int = 5270, reconnect_delay: Union[int, float] = 5) -> None:
         self.gcs_pipe = gcs_to_main_pipe
-        self.video_pipe = main_to_video_pipe
+        self.result_queues = result_queues #영상/탐지 프로세스별 탐지 결과 레코드 큐 (Detection_Results)
+        self.detection_records : np.ndarray = read_all([]) #마지막으로 읽은 탐지 결과 레코드 묶음 (메인에서 조회용)
         self.gcs_ip: str = gcs_ip
         self.gcs_port: int = gcs_port
         self.reconnect_delay: Union[int, float] = reconnect_delay
@@ -79,15 +82,16 @@ class GcsConnector:
     def send_location_data(self) -> None:
         try:
             while True:
-                detection = ''
-                if self.video_pipe.poll():
-                    detection = self.video_pipe.recv()
+                records = read_all(self.result_queues) #지난 주기 동안 쌓인 탐지 결과를 큐마다 한 번에 읽음
+                if len(records):
+                    self.detection_records = records
                 with self.drone_location_array.get_lock():  
                     drone_location = list(self.drone_location_array)
                 with self.tello_location_array.get_lock():
                     tello_location = list(self.tello_location_array)
                 data : Dict = {
-                    'detection' : detection,
+                    'detection' : legacy_detection(records), #예전 형식 (낙상이 확정된 박스 중심 (str(x), str(y)) 또는 '')
+                    'fall_event' : latest_fall_event(records), #(드론 IP, 객체 ID, 수신 시각, confidence, 박스) 또는 None
                     'drone_location' : drone_location,
                     'tello_location' : tello_location
                 }
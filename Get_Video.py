@@ -1,81 +1,304 @@
 import socket
 import av
-from typing import List, Any
+from typing import List, Any, Optional
 import threading
 import queue
-from Detection_Pipeline import DetectionPipeline
+import collections
+import time
+from Debug_Viewer import DebugViewer
+from Detection_Pipeline import DetectionPipeline, format_detection_snapshot
+from Detection_Results import DetectionResultQueue
+from Frame_Mailbox import FrameMailbox
+from Frame_Ring import SharedFrameRing, ring_name
+from Video_Replay import DatagramRecorder
+from Video_Archive import StreamArchiver, ClipBuffer
+from H264_Parser import AnnexBParser, NAL_IDR
+from Video_Decoder import DECODER_OPTIONS, ParameterSetCache, create_decoder, set_behind
+from Video_Metrics import IngestMetrics, format_snapshot
+
+DATAGRAM_SIZE = 2048 # 데이터그램 하나를 받는 슬롯 크기 (Tello는 최대 1460바이트씩 전송)
+FRAME_BUFFER_SIZE = 1 << 20 # 드론별 프레임 재조립 버퍼 크기 (1MB, 720p I-프레임도 충분히 수용)
+METRICS_INTERVAL = 5.0 # 수신/디코딩 지표 스냅샷을 메인 프로세스로 보내는(또는 출력하는) 주기(초)
+
 
 class VideoReceiver:
-    def __init__(self, tello_address: List[str], pipe : Any) -> None:
-        self.video_to_main_pipe = pipe #video 프로세스의 입출력 파이프(main과 연결)
+    def __init__(self, tello_address: List[str], pipe : Any, video_port: int = 11111, queue_size: int = 64, use_frame_ring: bool = False, capture_path: Optional[str] = None, metrics_queue: Any = None, archive_dir: Optional[str] = None, clip_dir: Optional[str] = None, decoder_options: Optional[dict] = None, batch_detection: bool = True, tiled_detection: bool = False, cascade_detection: bool = False, debug_view: bool = False, results_name: Optional[str] = None, detection_precision: str = "auto", clip_events: Any = None) -> None:
+        self.video_to_main_pipe = pipe #video 프로세스의 입출력 파이프(main과 연결). 낙상 확정 좌표만 문자열로 보내는 예전 방식 (None이면 안 씀)
+        self.results_name = results_name # 메인 프로세스가 만든 탐지 결과 공유 메모리 큐 이름 (Detection_Results 참고, 프레임마다 박스 전부를 레코드로 보냄)
         self.tello_address = tello_address #tello 주소(ip식별)
         self.video_socket: socket.socket = socket.socket(socket.AF_INET, socket.SOCK_DGRAM) # UDP 비디오 수신용 소켓 생성
         self.video_socket.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1) # 포트를 재사용할 수 있도록 설정 (빠른 재시작을 위해 필요)
-        self.video_socket.bind(("0.0.0.0", 11111)) # 모든 IP로부터 수신 가능하도록 11111 포트에 바인딩 (Tello의 비디오 스트림 기본 포트)
-        self.packet_queues = {ip: queue.Queue(maxsize=5) for ip in self.tello_address} # 각 Tello 드론의 IP에 대한 비디오 패킷 큐 생성 (최대 5개까지 버퍼링)
-        self.detection_pipeline = DetectionPipeline(self.video_to_main_pipe) # 영상 처리 파이프라인 객체 초기화 (예: 객체 탐지, YOLO 등)
-        
+        self.video_socket.bind(("0.0.0.0", video_port)) # 모든 IP로부터 수신 가능하도록 영상 포트에 바인딩 (Tello 기본값 11111, 드론별로 다르게 지정 가능)
+        self.packet_queues = {ip: queue.Queue(maxsize=queue_size) for ip in self.tello_address} # 각 Tello 드론의 IP에 대한 비디오 패킷 큐 생성 (큐에는 (슬롯 번호, 길이)만 들어감, 64개 ≒ 720p 프레임 2~3장)
+        self.resync_flags = {ip: threading.Event() for ip in self.tello_address} # 큐가 넘쳐서 다음 IDR까지 건너뛰어야 하는지 알리는 플래그
+        # 데이터그램 슬롯 풀: 큐에 들어갈 수 있는 최대 개수 + 디코더가 처리 중인 슬롯 + 수신 중인 슬롯
+        slot_count = len(self.tello_address) * (queue_size + 1) + 1
+        self.datagram_pool = memoryview(bytearray(slot_count * DATAGRAM_SIZE)) # 미리 할당한 수신 버퍼 (recvfrom_into로 바로 씀)
+        self.datagram_slots = [self.datagram_pool[i * DATAGRAM_SIZE:(i + 1) * DATAGRAM_SIZE] for i in range(slot_count)]
+        self.free_slots = collections.deque(range(slot_count)) # 비어있는 슬롯 번호 (deque의 append/popleft는 스레드 안전)
+        self.recorder = DatagramRecorder(capture_path) if capture_path else None # 받은 데이터그램을 전부 파일로 기록 (Video_Replay.py로 재생 가능)
+        self.archiver = StreamArchiver(archive_dir) if archive_dir else None # 받은 H.264를 재인코딩 없이 MKV로 보관 (사고 분석용)
+        self.clip_buffer = ClipBuffer(clip_dir) if clip_dir else None # 최근 영상을 메모리에 들고 있다가 낙상 탐지 시 전후 구간을 클립으로 저장
+        self.clip_events = clip_events # 탐지를 다른 프로세스에서 할 때 낙상 확정 (IP, 프레임 수신 시각)을 받는 multiprocessing.Queue
+        self.decoder_options = dict(DECODER_OPTIONS, **(decoder_options or {})) # 디코더 스레드/저지연 설정 (Video_Decoder.DECODER_OPTIONS 참고)
+        self.parameter_sets = {ip: ParameterSetCache() for ip in self.tello_address} # 드론별 마지막 SPS/PPS (디코더 재시작 시 바로 디코딩하기 위함)
+        self.metrics = {ip: IngestMetrics() for ip in self.tello_address} # 드론별 수신/디코딩 지표
+        self.metrics_queue = metrics_queue # 주기적으로 지표 스냅샷을 보낼 multiprocessing.Queue (없으면 출력만 함)
+        self.frame_mailbox = FrameMailbox(self.tello_address) # 디코더 → 디텍션으로 최신 프레임만 넘겨주는 우편함 (디코더가 YOLO를 기다리지 않도록 분리)
+        self.frame_rings = {} # use_frame_ring이면 디텍션을 별도 프로세스에서 돌리도록 프레임을 공유 메모리 링에 씀
+        self.detection_pipeline = None
+        self.batch_detection = batch_detection # 드론별 스레드 대신 모든 드론의 최신 프레임을 모아서 한 번에 추론
+        # 디코더가 탐지용으로 변환할 프레임 크기: 평소에는 모델 입력 크기, 타일 추론 모드면 원본 해상도
+        self.detection_frame_size = DetectionPipeline.FULL_FRAME_SIZE if tiled_detection else DetectionPipeline.INPUT_SIZE
+        if use_frame_ring:
+            width, height = self.detection_frame_size
+            self.frame_rings = {ip: SharedFrameRing(ring_name(ip), (height, width, 3)) for ip in self.tello_address}
+        else:
+            self.detection_pipeline = DetectionPipeline(self.video_to_main_pipe, self.tello_address, tiled=tiled_detection, cascade=cascade_detection, precision=detection_precision,
+                                                        debug_viewer=DebugViewer() if debug_view else None,
+                                                        results=DetectionResultQueue(results_name) if results_name else None) # 영상 처리 파이프라인 객체 초기화 (예: 객체 탐지, YOLO 등)
+            if self.clip_buffer: # 낙상이 확정되면 클립 저장을 시작 (탐지가 다른 프로세스면 clip_events로 받음, clip_event_listener)
+                self.detection_pipeline.event_callbacks.append(self.clip_buffer.trigger)
+
     def video_reciver(self) -> None:
         try:
+            slot = self.free_slots.popleft()
             while True:
-                data, (src_ip, _) = self.video_socket.recvfrom(2048) # 소켓으로부터 최대 2048바이트 크기의 비디오 패킷 수신
+                nbytes, (src_ip, _) = self.video_socket.recvfrom_into(self.datagram_slots[slot], DATAGRAM_SIZE) # 미리 할당된 슬롯에 바로 수신 (bytes 객체 생성 없음)
+                arrival_ts = time.time()
+                if self.recorder:
+                    self.recorder.write(arrival_ts, src_ip, self.datagram_slots[slot][:nbytes])
                 if src_ip in self.packet_queues: # 수신한 IP가 등록된 드론 주소 목록에 있는 경우만 처리
+                    metrics = self.metrics[src_ip]
+                    metrics.datagrams += 1
+                    metrics.bytes += nbytes
                     q = self.packet_queues[src_ip]
-                    if q.full(): # 큐가 가득 차면
-                        try:
-                            q.get_nowait()  #가장 오래된 패킷 제거 (frame drop)
-                        except queue.Empty:
-                            pass
-                    q.put_nowait(data) # 수신한 새 비디오 패킷을 큐에 추가
+                    if q.full(): # 큐가 가득 차면 (디코더가 밀림)
+                        # 패킷 하나만 버리면 진행 중인 프레임과 다음 IDR까지의 P-프레임이 모두 깨지므로,
+                        # 밀린 패킷을 전부 버리고 디코더에게 다음 IDR부터 다시 시작하라고 알림
+                        while True:
+                            try:
+                                old_slot, _, _ = q.get_nowait()
+                            except queue.Empty:
+                                break
+                            self.free_slots.append(old_slot) # 버려진 패킷의 슬롯은 다시 풀로 반환
+                            metrics.queue_drops += 1
+                        self.resync_flags[src_ip].set()
+                    q.put_nowait((slot, nbytes, arrival_ts)) # 수신한 새 비디오 패킷의 슬롯 번호, 길이, 수신 시각을 큐에 추가
+                    slot = self.free_slots.popleft() # 다음 수신에 쓸 빈 슬롯을 가져옴
+                # 등록되지 않은 IP의 패킷이면 같은 슬롯을 그대로 재사용
         except Exception as e:
             print(f"[Receiver Error] {e}")
-            
-            
+        finally:
+            if self.recorder:
+                self.recorder.close()
+            if self.clip_buffer: # 수신이 끝나면 모으는 중인 클립을 지금까지 받은 영상으로 마저 씀
+                self.clip_buffer.close()
+
+
     def decoder_worker(self, ip: str) -> None:
-        codec = av.CodecContext.create("h264", "r") # H.264 비디오 코덱 디코더를 생성 (읽기 모드 'r')
-        buffer = b"" # 버퍼를 초기화 (수신된 패킷을 임시 저장)
+        codec = create_decoder(self.decoder_options) # H.264 비디오 코덱 디코더를 생성 (스레드/저지연 설정 적용)
+        behind = False # 디코더가 밀려서 비참조 프레임을 건너뛰는 중인지
+        behind_depth = self.decoder_options['behind_queue_depth']
+        parser = AnnexBParser(FRAME_BUFFER_SIZE) # 시작 코드 기준으로 NAL을 나눠 access unit(프레임) 단위로 묶어주는 파서
+        metrics = self.metrics[ip]
+        resync = self.resync_flags[ip]
+        parameter_sets = self.parameter_sets[ip]
+        wait_idr = True # 스트림 시작 직후에도 IDR부터 디코딩
+        needs_parameter_sets = True # 새 디코더는 SPS/PPS를 아직 못 봤으므로 첫 access unit에 캐시한 SPS/PPS를 붙임
+        au_start_ts = None # 조립 중인 access unit의 첫 데이터그램 수신 시각
+        last_arrival_ts = None
+        first_frame_start = None # (재)시작 후 첫 데이터그램 수신 시각. 첫 프레임이 나오면 None
+        consecutive_failures = 0
+        restart_after = self.decoder_options['restart_after_failures']
+        stream_gap = self.decoder_options['stream_gap']
 
         try:
             while True:
-                pkt_data = self.packet_queues[ip].get() # 지정된 IP에 해당하는 패킷 큐에서 하나의 패킷을 가져옴 (blocking)
-                buffer += pkt_data # 기존 버퍼에 새로 받은 패킷 데이터를 추가
-
-                # 작은 패킷이 들어오면 프레임이 끝났다는 뜻
-                if len(pkt_data) < 1460:
+                slot, nbytes, arrival_ts = self.packet_queues[ip].get() # 지정된 IP에 해당하는 패킷 큐에서 하나의 패킷을 가져옴 (blocking)
+                if self.decoder_options['skip_frame_when_behind'] and (self.packet_queues[ip].qsize() >= behind_depth) != behind:
+                    behind = not behind
+                    set_behind(codec, behind)
+                if resync.is_set(): # 수신 스레드가 밀린 패킷을 버렸으면 조립 중이던 프레임도 버리고 다음 IDR을 기다림
+                    resync.clear()
+                    parser.reset()
+                    if not wait_idr:
+                        metrics.skipped_gops += 1
+                    wait_idr = True
+                    needs_parameter_sets = True
+                    au_start_ts = None
+                if last_arrival_ts is None or arrival_ts - last_arrival_ts > stream_gap: # 스트림 시작 또는 끊겼다가 다시 들어옴 (streamon, Wi-Fi 재연결)
+                    if last_arrival_ts is not None:
+                        metrics.stream_restarts += 1
+                        parser.reset() # 끊기기 전 조립 중이던 프레임은 이어지지 않음
+                        au_start_ts = None
+                        wait_idr = True
+                        needs_parameter_sets = True
+                    first_frame_start = arrival_ts
+                last_arrival_ts = arrival_ts
+                if au_start_ts is None:
+                    au_start_ts = arrival_ts
+                # 짧은 데이터그램은 프레임 끝이라는 힌트로만 사용 (실제 경계는 파서가 시작 코드로 판단)
+                for access_unit, nal_types in parser.feed(self.datagram_slots[slot][:nbytes], frame_end=nbytes < 1460):
+                    metrics.access_units += 1
+                    capture_ts = au_start_ts # 이 access unit이 도착하기 시작한 시각
+                    au_start_ts = arrival_ts # 다음 access unit은 지금 데이터그램에서 시작됨
+                    parameter_sets.update(access_unit, nal_types) # 건너뛰는 access unit의 SPS/PPS도 캐시함
+                    if wait_idr:
+                        if NAL_IDR not in nal_types or not parser.clean_idr: # 앞 슬라이스를 잃은 IDR도 위쪽이 깨지므로 온전한 IDR만 받음
+                            metrics.skipped_frames += 1 # 참조 프레임이 없어서 깨질 프레임은 디코딩하지 않고 건너뜀
+                            continue
+                        wait_idr = False
+                    if self.archiver:
+                        self.archiver.submit(ip, access_unit, nal_types, capture_ts) # 디코딩 전에 원본 access unit을 보관 (백그라운드 스레드에서 remux)
+                    if self.clip_buffer:
+                        self.clip_buffer.submit(ip, access_unit, nal_types, capture_ts)
+                    if needs_parameter_sets: # 재시작 직후에만 캐시한 SPS/PPS를 붙임 (이때만 bytes 복사가 생김)
+                        access_unit = parameter_sets.with_parameter_sets(access_unit, nal_types)
+                        needs_parameter_sets = not parameter_sets.ready()
                     try:
-                        packet = av.packet.Packet(buffer) # 하나의 완성된 패킷을 PyAV 패킷 객체로 생성
-                        frames = codec.decode(packet) # 디코더로부터 프레임을 디코딩
-                        for frame in frames:
-                            img = frame.to_ndarray(format="bgr24") # 프레임을 NumPy 배열(BGR24 포맷)로 변환
-                            self.detection_pipeline.process_frame(img, ip) # 디텍션 파이프라인으로 이미지와 IP를 넘김
-                    except Exception as decode_err: 
-                        #print(f"[Decode Fail @ {ip}] {decode_err}")
+                        packet = av.packet.Packet(access_unit) # 파서 버퍼의 슬라이스를 그대로 PyAV 패킷으로 생성 (중간 bytes 객체 없음)
+                        frames = codec.decode(packet) # 완성된 access unit 하나를 디코딩 (디코더가 내부적으로 데이터를 복사함)
+                        del packet
+                        consecutive_failures = 0
+                    except Exception as decode_err:
+                        metrics.decode_failures += 1
+                        metrics.last_decode_error = str(decode_err)
+                        consecutive_failures += 1
+                        if consecutive_failures >= restart_after: # 디코더 상태가 망가졌다고 보고 새로 만든 뒤 다음 IDR부터 캐시한 SPS/PPS로 다시 시작
+                            print(f"[Decoder {ip}] {consecutive_failures} consecutive decode failures, restarting decoder: {decode_err}")
+                            codec = create_decoder(self.decoder_options)
+                            behind = False
+                            metrics.decoder_restarts += 1
+                            consecutive_failures = 0
+                            needs_parameter_sets = True
+                            wait_idr = True
+                            first_frame_start = arrival_ts
                         continue
-                    buffer = b""  # 다음 프레임 준비
+                    for frame in frames:
+                        metrics.decoded_frames += 1
+                        if first_frame_start is not None:
+                            metrics.first_frame_times.append(time.time() - first_frame_start)
+                            print(f"[Decoder {ip}] first frame after {metrics.first_frame_times[-1] * 1000:.0f} ms")
+                            first_frame_start = None
+                        metrics.latency.observe(time.time() - capture_ts)
+                        # 색 변환과 축소를 swscale에서 한 번에 처리해서 모델 입력 크기의 BGR24 배열로 바로 변환 (학습 때와 같은 bicubic 보간)
+                        width, height = self.detection_frame_size
+                        img = frame.reformat(width=width, height=height, format="bgr24", interpolation="BICUBIC").to_ndarray()
+                        if self.frame_rings:
+                            self.frame_rings[ip].write(img, capture_ts, ip) # 디텍션 프로세스가 복사 없이 읽어가도록 공유 메모리 링에 씀 (블로킹 없음)
+                        else:
+                            self.frame_mailbox.put(ip, img, capture_ts) # 디텍션 스레드가 가져가도록 최신 프레임으로 덮어씀 (블로킹 없음)
+                self.free_slots.append(slot) # 파서 버퍼로 복사가 끝난 슬롯을 풀로 반환
+                metrics.overflows = parser.overflows
+                if parser.size == 0: # 데이터그램 끝에서 access unit이 끝났으면 다음 데이터그램부터 새 access unit
+                    au_start_ts = None
 
         except Exception as e:
             print(f"[Decoder {ip} Error] {e}")
 
 
+    def metrics_snapshot(self) -> dict:
+        # 드론별 지표 스냅샷 {ip: {...}} (같은 프로세스에서 탐지하면 탐지 스케줄러 지표도 'detection'에 담음)
+        detection = self.detection_pipeline.metrics_snapshot() if self.detection_pipeline else {}
+        return {ip: self.metrics[ip].snapshot(self.packet_queues[ip].qsize(), {
+                    'mailbox_overwritten': self.frame_mailbox.overwritten[ip],
+                    'mailbox_delivered': self.frame_mailbox.delivered[ip],
+                    'archive_dropped': self.archiver.dropped.get(ip, 0) if self.archiver else 0,
+                    'detection': detection.get(ip),
+                }) for ip in self.tello_address}
+
+
+    def metrics_reporter(self) -> None:
+        # 일정 주기로 스냅샷을 메인 프로세스로 보냄 (큐가 없으면 한 줄 요약을 출력)
+        while True:
+            time.sleep(METRICS_INTERVAL)
+            snapshot = self.metrics_snapshot()
+            if self.metrics_queue is not None:
+                try:
+                    self.metrics_queue.put_nowait(snapshot)
+                except queue.Full:
+                    pass
+            else:
+                for ip, snap in snapshot.items():
+                    print(format_snapshot(ip, snap))
+                    if snap['detection']:
+                        print(format_detection_snapshot(ip, snap['detection']))
+
+
+
+
+    def detection_worker(self, ip: str) -> None:
+        try:
+            while True:
+                self.detection_pipeline.scheduler.wait_turn(ip) # 스케줄러가 정한 탐지 시각까지 대기 (그동안 들어온 프레임은 우편함에서 최신 것으로 덮어써짐)
+                frame, capture_ts = self.frame_mailbox.get(ip) # 가장 최근에 디코딩된 프레임을 가져옴 (없으면 대기)
+                self.detection_pipeline.process_frame(frame, ip, capture_ts) # 디텍션 파이프라인으로 이미지와 IP를 넘김
+        except Exception as e:
+            print(f"[Detection {ip} Error] {e}")
+
+    def batch_detection_worker(self) -> None:
+        try:
+            while True:
+                scheduler = self.detection_pipeline.scheduler
+                due = scheduler.wait_due(self.tello_address) # 스케줄러가 정한 탐지 차례가 된 드론만 모음
+                if not due:
+                    continue
+                # 드론별 최신 프레임을 짧은 시간 동안 모음. 영상이 끊긴 드론은 다른 드론의 차례가 올 때까지만 기다리고 다음 주기로 미룸
+                batch = self.frame_mailbox.get_batch(due, DetectionPipeline.BATCH_WINDOW, scheduler.frame_timeout(self.tello_address, due))
+                missing = [ip for ip in due if ip not in batch]
+                if missing:
+                    scheduler.defer(missing)
+                if not batch:
+                    continue
+                ips = list(batch)
+                self.detection_pipeline.process_batch([batch[ip][0] for ip in ips], ips, [batch[ip][1] for ip in ips]) # model.predict 한 번으로 모든 드론 프레임을 탐지
+        except Exception as e:
+            print(f"[Batch Detection Error] {e}")
+
+
+    def clip_event_listener(self) -> None:
+        # 탐지 프로세스가 보낸 낙상 확정 이벤트로 클립 저장을 시작
+        while True:
+            ip, event_ts = self.clip_events.get()
+            self.clip_buffer.trigger(ip, event_ts)
 
 
     def vid_main(self) -> None:
         threads: List[threading.Thread] = [] # 스레드를 저장할 리스트 초기화
-        
+
+        # 0. 첫 프레임이 들어오기 전에 탐지 모델을 미리 돌려둠 (이륙 직후 첫 탐지가 늦어지지 않도록)
+        if self.detection_pipeline:
+            self.detection_pipeline.warmup(len(self.tello_address) if self.batch_detection else 1)
+
         # 1. 영상 수신 스레드 생성 및 시작
         recv_thread = threading.Thread(target=self.video_reciver)  # video_reciver는 각 드론으로부터 UDP로 영상 데이터를 수신
         recv_thread.start()
         threads.append(recv_thread)
-        
+
+        metrics_thread = threading.Thread(target=self.metrics_reporter, daemon=True) # 지표 스냅샷을 주기적으로 내보내는 스레드
+        metrics_thread.start()
+        if self.clip_buffer and self.clip_events is not None:
+            threading.Thread(target=self.clip_event_listener, daemon=True).start()
+
         # 2. 각 드론 IP별 디코더 스레드 생성 및 시작
         for ip in self.tello_address:
             dec_thread = threading.Thread(target=self.decoder_worker, args=(ip,)) # decoder_worker는 해당 IP의 패킷 큐를 받아 H.264 프레임으로 디코딩
             dec_thread.start()
             threads.append(dec_thread)
+
+        # 3. 디텍션 스레드 생성 및 시작 (디코딩과 추론을 분리, 공유 메모리 링을 쓰면 디텍션은 다른 프로세스에서 실행됨)
+        if self.detection_pipeline and self.batch_detection:
+            det_thread = threading.Thread(target=self.batch_detection_worker) # 모든 드론의 최신 프레임을 모아 YOLO 한 번으로 탐지
+            det_thread.start()
+            threads.append(det_thread)
+        for ip in self.tello_address if self.detection_pipeline and not self.batch_detection else []:
+            det_thread = threading.Thread(target=self.detection_worker, args=(ip,)) # detection_worker는 우편함에서 최신 프레임을 꺼내 YOLO로 탐지
+            det_thread.start()
+            threads.append(det_thread)
         try:
-            # 3. 모든 스레드가 종료될 때까지 대기 (영상 수신 + 디코더들)
+            # 4. 모든 스레드가 종료될 때까지 대기 (영상 수신 + 디코더들 + 디텍션들)
             for t in threads:
                 t.join()
         except Exception as e:
             print(f"[Main Error] {e}")
-
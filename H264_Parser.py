@@ -0,0 +1,124 @@
+from typing import Iterator, List, Optional, Tuple
+
+NAL_SLICE = 1 # non-IDR 슬라이스
+NAL_IDR = 5 # IDR 슬라이스 (키프레임)
+NAL_SEI = 6
+NAL_SPS = 7
+NAL_PPS = 8
+NAL_AUD = 9 # access unit delimiter
+VCL_TYPES = (NAL_SLICE, NAL_IDR)
+AU_START_TYPES = (NAL_SEI, NAL_SPS, NAL_PPS, NAL_AUD) # VCL 뒤에 오면 새 access unit의 시작을 뜻하는 NAL
+
+START_CODE = b"\x00\x00\x01"
+
+
+class AnnexBParser:
+    '''
+    H.264 Annex-B 바이트 스트림에서 시작 코드를 찾아 NAL 단위로 나누고, NAL들을 access unit(=한 프레임)으로 묶어주는 파서.
+    - 데이터그램 경계와 상관없이 feed()에 들어온 순서대로 바이트를 이어붙여 처리함.
+    - 미리 할당한 버퍼 하나만 사용하며, 내보내는 access unit은 그 버퍼의 memoryview 슬라이스임.
+      (다음 반복으로 넘어가면 버퍼 내용이 바뀌므로 반복문 안에서 바로 사용해야 함)
+    - 처음과 reset() 뒤에는 access unit이 확실히 시작되는 NAL(SPS/PPS/AUD/SEI 또는 first_mb_in_slice == 0인 슬라이스)이
+      나올 때까지 NAL을 버림: 여러 슬라이스로 나눠진 프레임의 중간 슬라이스부터 한 프레임으로 묶지 않게 함.
+    '''
+    def __init__(self, capacity: int = 1 << 20) -> None:
+        self.capacity = capacity
+        self.buffer = bytearray(capacity) # 재조립 버퍼 (크기 고정)
+        self.view = memoryview(self.buffer)
+        self.size = 0 # 버퍼에 쌓인 바이트 수
+        self.scan_pos = 0 # 다음에 시작 코드를 찾기 시작할 위치
+        self.nals: List[Tuple[int, int]] = [] # 현재 access unit에 들어있는 (NAL 시작 위치, NAL 타입)
+        self.overflows = 0 # 버퍼를 넘쳐서 버린 횟수
+        self.synced = False # False면 access unit 시작을 찾을 때까지 NAL을 버리는 중
+        self.idr_first_mb_zero: Optional[bool] = None # 조립 중인 access unit의 첫 IDR 슬라이스가 first_mb_in_slice == 0인지 (IDR이 없으면 None)
+        self.clean_idr = False # 방금 내보낸 access unit이 첫 매크로블록부터 온전히 시작하는 IDR인지 (디코더가 IDR부터 다시 시작할 때 확인)
+
+    def reset(self) -> None:
+        # 스트림이 끊겼을 때 쌓인 데이터를 모두 버림
+        self.size = 0
+        self.scan_pos = 0
+        self.nals = []
+        self.synced = False
+        self.idr_first_mb_zero = None
+
+    def has_vcl(self) -> bool:
+        return any(nal_type in VCL_TYPES for _, nal_type in self.nals)
+
+    def feed(self, data, frame_end: bool = False) -> Iterator[Tuple[memoryview, Tuple[int, ...]]]:
+        '''
+        - data: 새로 받은 바이트 (bytes/memoryview)
+        - frame_end: 송신 측이 프레임 끝을 알려준 경우(Tello의 짧은 데이터그램). 마지막 NAL이 슬라이스라면 바로 내보냄.
+        - yield: (access unit 슬라이스, 들어있는 NAL 타입들)
+        '''
+        nbytes = len(data)
+        if self.size + nbytes > self.capacity:
+            self.overflows += 1
+            self.reset() # 비정상적으로 큰 프레임은 버리고 다음 시작 코드부터 다시 맞춤
+            if nbytes > self.capacity:
+                return
+        self.view[self.size:self.size + nbytes] = data
+        self.size += nbytes
+
+        while True:
+            pos = self.buffer.find(START_CODE, self.scan_pos, self.size)
+            if pos == -1:
+                self.scan_pos = max(self.size - 2, self.scan_pos) # 시작 코드가 데이터그램 경계에 걸친 경우를 대비
+                if not self.nals:
+                    self._compact(self.scan_pos) # 버리는 중인 NAL의 데이터는 쌓아두지 않음
+                break
+            if pos + 4 >= self.size:
+                self.scan_pos = pos # NAL 헤더(와 first_mb_in_slice)가 아직 안 들어옴
+                break
+            nal_start = pos - 1 if pos > 0 and self.buffer[pos - 1] == 0 else pos # 4바이트 시작 코드(00 00 00 01) 처리
+            nal_type = self.buffer[pos + 3] & 0x1F
+            first_mb_zero = bool(self.buffer[pos + 4] & 0x80) # first_mb_in_slice == 0 이면 ue(v) 첫 비트가 1
+            self.scan_pos = pos + 3
+            if not self.synced:
+                if not (nal_type in AU_START_TYPES or (nal_type in VCL_TYPES and first_mb_zero)):
+                    self._compact(self.scan_pos) # 앞부분을 잃은 프레임의 뒷 슬라이스는 버림
+                    continue
+                self.synced = True
+            if self.has_vcl() and (nal_type in AU_START_TYPES or (nal_type in VCL_TYPES and first_mb_zero)):
+                yield from self._emit(nal_start)
+                nal_start = 0
+            if not self.nals and nal_start > 0:
+                self._compact(nal_start) # 첫 시작 코드 앞의 쓰레기 데이터는 버림
+                nal_start = 0
+            self.nals.append((nal_start, nal_type))
+            if nal_type == NAL_IDR and self.idr_first_mb_zero is None:
+                self.idr_first_mb_zero = first_mb_zero
+
+        if frame_end and self.nals and self.nals[-1][1] in VCL_TYPES:
+            yield from self._emit(self.size)
+
+    def _emit(self, end: int) -> Iterator[Tuple[memoryview, Tuple[int, ...]]]:
+        nal_types = tuple(nal_type for _, nal_type in self.nals)
+        self.clean_idr = bool(self.idr_first_mb_zero)
+        self.idr_first_mb_zero = None
+        yield self.view[:end], nal_types
+        self._compact(end)
+        self.nals = []
+
+    def _compact(self, start: int) -> None:
+        # start 이후의 남은 데이터를 버퍼 앞으로 당김
+        remain = self.size - start
+        if remain:
+            self.view[:remain] = self.view[start:self.size] # memoryview 복사는 겹치는 영역도 memmove로 처리됨
+        self.size = remain
+        self.scan_pos = max(self.scan_pos - start, 0)
+
+
+def iter_nal_units(data) -> Iterator[Tuple[int, memoryview]]:
+    '''
+    완성된 access unit(또는 Annex-B 조각)을 NAL 단위로 나눔.
+    - yield: (NAL 타입, 시작 코드를 포함한 NAL 슬라이스)
+    '''
+    raw = bytes(data) # 파서 버퍼 슬라이스는 곧 덮어써지므로 복사본에서 나눔 (SPS/PPS가 든 access unit에서만 호출)
+    view = memoryview(raw)
+    pos = raw.find(START_CODE)
+    while pos != -1 and pos + 3 < len(raw):
+        nal_start = pos - 1 if pos > 0 and raw[pos - 1] == 0 else pos
+        nal_type = raw[pos + 3] & 0x1F
+        pos = raw.find(START_CODE, pos + 3)
+        nal_end = len(raw) if pos == -1 else (pos - 1 if raw[pos - 1] == 0 else pos)
+        yield nal_type, view[nal_start:nal_end]
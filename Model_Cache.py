@@ -0,0 +1,65 @@
+import hashlib
+import os
+import shutil
+import time
+from typing import Tuple
+
+MODEL_CACHE_DIR = os.environ.get("TELLO_MODEL_CACHE", "model_cache") # 내보낸/최적화된 모델을 보관하는 폴더
+
+
+def weights_hash(path: str) -> str:
+    # 가중치 파일 내용의 sha256 앞 16자리 (같은 이름이라도 다시 학습한 가중치면 키가 달라짐)
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(1 << 20), b""):
+            digest.update(chunk)
+    return digest.hexdigest()[:16]
+
+
+def cache_key(model_path: str, backend: str, precision: str, imgsz: Tuple[int, int]) -> str:
+    stem = os.path.splitext(os.path.basename(model_path))[0]
+    return f"{stem}_{weights_hash(model_path)}_{backend}_{precision}_{imgsz[0]}x{imgsz[1]}"
+
+
+def cached_export(model_path: str, backend: str, precision: str, imgsz: Tuple[int, int], cache_dir: str = MODEL_CACHE_DIR) -> str:
+    '''
+    .pt 가중치를 백엔드 형식(ONNX, OpenVINO IR)으로 내보낸 결과를 캐시 폴더에 보관하고 그 경로를 반환.
+    - 키는 (가중치 해시, 백엔드, 정밀도, 입력 크기)이므로 같은 조합이면 내보내기는 처음 한 번만 일어남.
+    - ultralytics 백엔드이거나 이미 내보낸 파일(.onnx/.xml)을 받으면 그대로 반환.
+    '''
+    if backend == "ultralytics" or not model_path.endswith(".pt"):
+        return model_path
+    key = cache_key(model_path, backend, precision, imgsz)
+    target = os.path.join(cache_dir, key + (".onnx" if backend == "onnxruntime" else ""))
+    cached = target if backend == "onnxruntime" else os.path.join(target, "model.xml")
+    if os.path.exists(cached):
+        print(f"[Model Cache] hit {cached}")
+        return cached
+    os.makedirs(cache_dir, exist_ok=True)
+    start = time.perf_counter()
+    from ultralytics import YOLO
+    exported = YOLO(model_path).export(format="openvino" if backend == "openvino" else "onnx", imgsz=imgsz,
+                                     dynamic=backend == "onnxruntime", half=backend == "onnxruntime" and precision == "fp16")
+    # 내보낸 결과는 가중치 옆에 생기므로 캐시 폴더로 옮김 (임시 이름으로 옮긴 뒤 rename해서 중간에 끊겨도 반쯤 쓴 캐시가 남지 않게 함)
+    staging = target + ".tmp"
+    if backend == "openvino":
+        shutil.rmtree(staging, ignore_errors=True)
+    shutil.move(exported, staging)
+    if backend == "openvino":
+        stem = os.path.splitext(os.path.basename(model_path))[0]
+        for ext in (".xml", ".bin"): # 폴더 안의 IR 파일 이름을 키와 상관없이 고정
+            os.replace(os.path.join(staging, stem + ext), os.path.join(staging, "model" + ext))
+    os.replace(staging, target)
+    print(f"[Model Cache] exported {cached} in {time.perf_counter() - start:.1f}s")
+    return cached
+
+
+def optimized_model_path(model_path: str, device: str, cache_dir: str = MODEL_CACHE_DIR) -> str:
+    # ONNX Runtime이 그래프 최적화를 마친 모델을 저장할 경로 (ONNX 파일 내용과 실행 장치별로 결과가 다름)
+    stem = os.path.splitext(os.path.basename(model_path))[0]
+    return os.path.join(cache_dir, f"{stem}_{weights_hash(model_path)}_{device}.opt.onnx")
+
+
+def compiled_cache_dir(cache_dir: str = MODEL_CACHE_DIR) -> str:
+    # OpenVINO가 컴파일한 blob을 저장할 폴더 (CACHE_DIR 속성으로 넘기면 OpenVINO가 모델/장치별로 알아서 키를 잡음)
+    return os.path.join(cache_dir, "openvino_blobs")
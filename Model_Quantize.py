@@ -0,0 +1,226 @@
+import argparse
+import hashlib
+import json
+import os
+import time
+from typing import Dict, Iterator, List, Optional, Tuple
+import cv2
+import numpy as np
+from Model_Cache import MODEL_CACHE_DIR, cache_key, cached_export, weights_hash
+
+CALIBRATION_SOURCE = os.environ.get("TELLO_CALIBRATION", "calibration") # INT8 보정용 프레임: 이미지 폴더 또는 캡처/영상 파일
+CALIBRATION_FRAMES = 64
+FRAME_SIZE = (854, 480) # 보정 프레임 크기 (width, height). DetectionPipeline.INPUT_SIZE와 같게 맞춰서 실제 탐지 입력과 같은 분포로 보정
+IMAGE_EXTENSIONS = (".jpg", ".jpeg", ".png", ".bmp")
+
+
+def load_calibration_frames(source: str, count: int = CALIBRATION_FRAMES, skip: int = 0) -> List[np.ndarray]:
+    '''
+    보정/평가용 프레임(BGR, FRAME_SIZE)을 읽어서 반환.
+    - 폴더면 안의 이미지 파일을 이름 순서로, 파일이면 Benchmark_Detection.load_frames와 같은 방식으로 디코딩 (.tcap, raw H.264, mkv/mp4).
+    - skip: 앞에서 건너뛸 프레임 수 (같은 영상에서 보정용과 평가용을 겹치지 않게 나눌 때)
+    '''
+    if os.path.isdir(source):
+        names = sorted(name for name in os.listdir(source) if name.lower().endswith(IMAGE_EXTENSIONS))[skip:skip + count]
+        frames = [cv2.imread(os.path.join(source, name)) for name in names]
+        return [cv2.resize(frame, FRAME_SIZE, interpolation=cv2.INTER_AREA) for frame in frames if frame is not None]
+    from Benchmark_Detection import load_frames
+    return load_frames(source, skip + count)[skip:]
+
+
+def source_hash(source: str) -> str:
+    # 보정 데이터가 바뀌면 양자화 모델도 다시 만들도록 캐시 키에 넣는 해시 (폴더면 파일 이름과 내용 전체)
+    if not os.path.isdir(source):
+        return weights_hash(source)
+    digest = hashlib.sha256()
+    for name in sorted(os.listdir(source)):
+        digest.update(name.encode())
+        digest.update(weights_hash(os.path.join(source, name)).encode())
+    return digest.hexdigest()[:16]
+
+
+class FrameCalibrationReader:
+    # onnxruntime.quantization의 CalibrationDataReader: 탐지할 때와 같은 letterbox/정규화(InputBuffers)로 한 장씩 넘김
+    def __init__(self, input_name: str, frames: List[np.ndarray], imgsz: Tuple[int, int]) -> None:
+        from Detection_Backend import InputBuffers
+        self.input_name = input_name
+        self.frames = frames
+        self.buffers = InputBuffers(imgsz, np.float32)
+        self.batches: Iterator = iter(())
+        self.rewind()
+
+    def get_next(self) -> Optional[Dict[str, np.ndarray]]:
+        return next(self.batches, None)
+
+    def rewind(self) -> None:
+        self.batches = ({self.input_name: self.buffers.fill([frame])[0].copy()} for frame in self.frames)
+
+
+def quantize_onnx(model_path: str, output_path: str, frames: List[np.ndarray], imgsz: Tuple[int, int]) -> str:
+    '''
+    FP32 ONNX 모델을 보정 프레임으로 정적 INT8 양자화 (QDQ 형식, weight는 채널별 int8, activation은 uint8).
+    - Conv/MatMul만 양자화하고 탐지 헤드의 박스 디코딩(Concat, Sigmoid, 좌표 연산)은 FP32로 둠:
+      좌표(수백 px)와 클래스 점수(0~1)가 한 텐서에 섞여 있어서 같이 양자화하면 점수가 대부분 0으로 뭉개짐
+    - QDQ 모델은 ONNX Runtime(QLinearConv로 합쳐서 실행)과 OpenVINO(FakeQuantize로 읽음) 둘 다에서 INT8로 돌아감
+    '''
+    import onnxruntime
+    from onnxruntime.quantization import CalibrationMethod, QuantFormat, QuantType, quantize_static
+    from onnxruntime.quantization.shape_inference import quant_pre_process
+    input_name = onnxruntime.InferenceSession(model_path, providers=["CPUExecutionProvider"]).get_inputs()[0].name
+    staging = output_path + ".tmp"
+    try:
+        quant_pre_process(model_path, staging) # 상수 접기/shape 추론을 먼저 해 두면 양자화할 노드를 더 많이 찾음
+        source = staging
+    except Exception as e:
+        print(f"[Model Quantize] pre-processing skipped: {e}")
+        source = model_path
+    quantize_static(source, output_path, FrameCalibrationReader(input_name, frames, imgsz), quant_format=QuantFormat.QDQ,
+                    activation_type=QuantType.QUInt8, weight_type=QuantType.QInt8, per_channel=True,
+                    op_types_to_quantize=["Conv", "MatMul"], calibrate_method=CalibrationMethod.MinMax)
+    if os.path.exists(staging):
+        os.remove(staging)
+    return output_path
+
+
+def quantize_openvino(model_path: str, output_path: str, frames: List[np.ndarray], imgsz: Tuple[int, int]) -> str:
+    # 이미 OpenVINO IR(.xml)로 받은 모델은 NNCF로 양자화 (ONNX가 있으면 quantize_onnx 쪽이 의존성이 적음)
+    import nncf
+    import openvino
+    from Detection_Backend import InputBuffers
+    buffers = InputBuffers(imgsz, np.float32)
+    dataset = nncf.Dataset(frames, lambda frame: buffers.fill([frame])[0].copy())
+    quantized = nncf.quantize(openvino.Core().read_model(model_path), dataset, subset_size=len(frames))
+    openvino.save_model(quantized, output_path)
+    return output_path
+
+
+def is_quantized(model_path: str) -> bool:
+    # 이미 양자화된 모델이면 (QDQ ONNX 또는 FakeQuantize가 들어간 IR) 다시 양자화하지 않음
+    if model_path.endswith(".xml"):
+        with open(model_path, encoding="utf-8") as f:
+            return "FakeQuantize" in f.read()
+    import onnx
+    model = onnx.load(model_path, load_external_data=False)
+    return any(node.op_type in ("QuantizeLinear", "QLinearConv", "ConvInteger") for node in model.graph.node)
+
+
+def quantized_model(model_path: str, backend: str, imgsz: Tuple[int, int], calibration: Optional[str] = None,
+                    cache_dir: str = MODEL_CACHE_DIR) -> str:
+    '''
+    precision="int8"일 때 create_backend가 부르는 함수: INT8 모델 경로를 반환 (캐시에 있으면 바로, 없으면 보정해서 만듦).
+    - .pt는 FP32 ONNX로 내보낸 뒤 양자화. onnxruntime, openvino 백엔드 모두 같은 QDQ ONNX 모델을 씀
+    - 키는 (가중치 해시, 입력 크기, 보정 데이터 해시)이므로 보정 프레임을 바꾸면 다시 만듦
+    '''
+    if model_path.endswith(".pt"):
+        model_path = cached_export(model_path, "onnxruntime", "fp32", imgsz, cache_dir)
+    if is_quantized(model_path):
+        return model_path
+    calibration = calibration or CALIBRATION_SOURCE
+    if not os.path.exists(calibration):
+        raise FileNotFoundError(f"INT8 calibration frames not found: {calibration} (set TELLO_CALIBRATION or pass calibration)")
+    openvino_ir = model_path.endswith(".xml")
+    key = cache_key(model_path, "openvino" if openvino_ir else "onnxruntime", "int8", imgsz) + "_" + source_hash(calibration)
+    target = os.path.join(cache_dir, key + (".xml" if openvino_ir else ".onnx"))
+    if os.path.exists(target):
+        print(f"[Model Quantize] hit {target}")
+        return target
+    os.makedirs(cache_dir, exist_ok=True)
+    start = time.perf_counter()
+    frames = load_calibration_frames(calibration)
+    (quantize_openvino if openvino_ir else quantize_onnx)(model_path, target, frames, imgsz)
+    print(f"[Model Quantize] {backend} int8 model {target} calibrated on {len(frames)} frames in {time.perf_counter() - start:.1f}s")
+    return target
+
+
+def model_size_mb(model_path: str) -> float:
+    # 모델 파일 전체 크기: IR은 .xml 옆의 .bin(가중치), ONNX는 external data 파일까지 더함
+    paths = {model_path}
+    if model_path.endswith(".xml"):
+        paths.add(os.path.splitext(model_path)[0] + ".bin")
+    elif model_path.endswith(".onnx"):
+        import onnx
+        from onnx.external_data_helper import ExternalDataInfo, uses_external_data
+        model = onnx.load(model_path, load_external_data=False)
+        folder = os.path.dirname(model_path)
+        paths.update(os.path.join(folder, ExternalDataInfo(tensor).location)
+                     for tensor in model.graph.initializer if uses_external_data(tensor))
+    return sum(os.path.getsize(path) for path in paths if os.path.exists(path)) / (1 << 20)
+
+
+def evaluate(model_path: str, backend: str, device: str, precision: str, frames: List[np.ndarray], reference: Optional[List[np.ndarray]] = None,
+             calibration: Optional[str] = None, runs: int = 2) -> Tuple[Dict, List[np.ndarray]]:
+    '''
+    평가 프레임에서 한 정밀도의 속도와 (reference가 있으면) FP32 결과와의 일치도를 잼.
+    - 라벨이 없는 영상이라 FP32 탐지 결과를 기준으로 삼음: recall은 FP32 박스 중 같은 클래스, IoU 0.5 이상으로 다시 찾은 비율
+    - fall_recall은 낙상(cls 1) 박스만 따로 센 값 (INT8로 바꿔서 놓치면 안 되는 쪽)
+    - FP32와 INT8을 같은 백엔드/장치에서 재야 속도 비교가 되므로 backend, device는 호출하는 쪽에서 정해서 넘김
+    '''
+    from Benchmark_Detection import match_detections
+    from Detection_Backend import create_backend
+    instance = create_backend(model_path, backend, device, precision, calibration=calibration)
+    instance.predict(frames[:1]) # 첫 추론(메모리 할당, 커널 선택)은 빼고 잼
+    times = []
+    for _ in range(runs):
+        for frame in frames:
+            start = time.perf_counter()
+            instance.predict([frame])
+            times.append(time.perf_counter() - start)
+    outputs = [instance.predict([frame])[0] for frame in frames]
+    times.sort()
+    result = {
+        'backend': instance.name,
+        'device': device,
+        'precision': instance.precision,
+        'model': instance.model_path,
+        'model_mb': model_size_mb(instance.model_path),
+        'load_ms': instance.load_time * 1000,
+        'ms_per_frame': sum(times) / len(times) * 1000,
+        'p95_ms': times[min(int(len(times) * 0.95), len(times) - 1)] * 1000,
+        'fps': len(times) / sum(times),
+        'boxes': sum(map(len, outputs)),
+    }
+    if reference is not None:
+        matched = sum(match_detections(ref, out) for ref, out in zip(reference, outputs))
+        falls = [ref[ref[:, 5] == 1] for ref in reference]
+        fall_matched = sum(match_detections(fall, out) for fall, out in zip(falls, outputs))
+        reference_boxes, output_boxes, fall_boxes = sum(map(len, reference)), result['boxes'], sum(map(len, falls))
+        result.update({
+            'recall': matched / reference_boxes if reference_boxes else 1.0,
+            'precision_vs_fp32': matched / output_boxes if output_boxes else 1.0,
+            'fall_recall': fall_matched / fall_boxes if fall_boxes else 1.0,
+        })
+    return result, outputs
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="탐지 모델 INT8 양자화 + FP32 대비 정확도/속도 리포트")
+    parser.add_argument("model", help="가중치(.pt) 또는 FP32 ONNX/OpenVINO IR 모델")
+    parser.add_argument("--calibration", default=CALIBRATION_SOURCE, help="보정 프레임: 이미지 폴더 또는 캡처/영상 파일")
+    parser.add_argument("--held-out", help="평가 프레임 (생략하면 보정 영상에서 보정에 쓰지 않은 뒤쪽 프레임)")
+    parser.add_argument("--frames", type=int, default=200, help="평가 프레임 수")
+    parser.add_argument("--backend", default="auto", choices=("auto", "onnxruntime", "openvino"))
+    parser.add_argument("--report", default="int8_report.json")
+    args = parser.parse_args()
+
+    if args.held_out:
+        frames = load_calibration_frames(args.held_out, args.frames)
+    else:
+        frames = load_calibration_frames(args.calibration, args.frames, skip=CALIBRATION_FRAMES)
+    if not frames:
+        parser.error("no held-out frames (give --held-out, or a calibration source longer than the calibration set)")
+    from Detection_Backend import select_backend
+    backend, device, _ = select_backend(args.backend, "auto", "int8") # INT8이 돌 백엔드/장치에 FP32 기준도 맞춤 (CUDA가 있어도 GPU FP32와 비교하지 않음)
+    fp32, reference = evaluate(args.model, backend, device, "fp32", frames)
+    int8, _ = evaluate(args.model, backend, device, "int8", frames, reference, args.calibration)
+    report = {'backend': backend, 'device': device, 'held_out': args.held_out or f"{args.calibration} (after {CALIBRATION_FRAMES} calibration frames)",
+              'frames': len(frames), 'fp32': fp32, 'int8': int8, 'speedup': int8['fps'] / fp32['fps']}
+    with open(args.report, "w") as f:
+        json.dump(report, f, indent=2)
+    for name, result in (("fp32", fp32), ("int8", int8)):
+        print(f"{name}: {result['ms_per_frame']:.2f} ms/frame (p95 {result['p95_ms']:.2f})  {result['fps']:.1f} fps  {result['model_mb']:.1f} MB")
+    print(f"int8 vs fp32: speedup x{report['speedup']:.2f}  recall={int8['recall']:.3f}  precision={int8['precision_vs_fp32']:.3f}  "
+          f"fall recall={int8['fall_recall']:.3f}  -> {args.report}")
+
+
+if __name__ == "__main__":
+    main()
@@ -17,6 +17,11 @@ class Action:
         return self.send_command('streamon',wait_time)
 
 
+    def set_video_port(self, video_port: int, state_port: int = 8890, wait_time: float = 1) -> str:
+        self.empty_response()
+        return self.send_command(f'port {state_port} {video_port}', wait_time) #영상 스트림을 보낼 UDP 포트를 변경 (streamon 전에 호출해야 함)
+
+
     def get_battery(self, wait_time : float = 1) -> None:
         self.empty_response()
         bat = self.send_command("battery?",wait_time)
@@ -0,0 +1,218 @@
+import collections
+import io
+import os
+import queue
+import threading
+import time
+from fractions import Fraction
+from typing import Any, Dict, Optional, Tuple
+import av
+from H264_Parser import NAL_IDR
+
+TIME_BASE = Fraction(1, 1000) # 패킷 타임스탬프 단위 (ms, 수신 시각 기준)
+CLIP_FLUSH_INTERVAL = 0.5 # 클립 writer 스레드가 deadline이 지난 클립을 확인하는 주기 (초)
+
+
+def open_remux_output(path: str, first_idr: bytes) -> Tuple[Any, Any, Any]:
+    '''
+    H.264 access unit을 디코딩/재인코딩 없이 MKV/MP4로 옮겨 담을 출력 컨테이너를 엶.
+    - 첫 IDR access unit(SPS/PPS 포함)을 h264 demuxer로 한 번 읽어서 해상도/extradata를 가진 스트림 템플릿을 만듦.
+    - return: (출력 컨테이너, 출력 스트림, 템플릿 입력 컨테이너 — 출력이 끝날 때 같이 닫아야 함)
+    '''
+    template_input = av.open(io.BytesIO(first_idr), format="h264")
+    template = template_input.streams.video[0]
+    output = av.open(path, "w")
+    if hasattr(output, "add_stream_from_template"): # PyAV 14+
+        stream = output.add_stream_from_template(template)
+    else:
+        stream = output.add_stream(template=template)
+    stream.time_base = TIME_BASE
+    return output, stream, template_input
+
+
+class RemuxWriter:
+    '''
+    드론 한 대의 access unit들을 파일 하나로 remux 하는 클래스. 첫 IDR이 들어올 때 파일을 엶.
+    '''
+    def __init__(self, path: str) -> None:
+        self.path = path
+        self.output = None
+        self.stream = None
+        self.template_input = None
+        self.first_ts: Optional[float] = None
+        self.last_pts = -1
+        self.packets = 0
+
+    def write(self, access_unit: bytes, is_idr: bool, capture_ts: float) -> None:
+        if self.output is None:
+            if not is_idr: # IDR 전의 프레임은 단독으로 디코딩할 수 없으므로 버림
+                return
+            self.output, self.stream, self.template_input = open_remux_output(self.path, access_unit)
+            self.first_ts = capture_ts
+        pts = max(int((capture_ts - self.first_ts) * 1000), self.last_pts + 1) # 타임스탬프는 단조 증가해야 함
+        packet = av.Packet(access_unit)
+        packet.stream = self.stream
+        packet.time_base = TIME_BASE
+        packet.pts = packet.dts = pts
+        packet.is_keyframe = is_idr
+        self.output.mux(packet)
+        self.last_pts = pts
+        self.packets += 1
+
+    def close(self) -> None:
+        if self.output is not None:
+            self.output.close()
+            self.template_input.close()
+            self.output = None
+
+
+class StreamArchiver:
+    '''
+    수신한 H.264 access unit을 디코딩/재인코딩 없이 드론별 MKV(또는 MP4) 파일로 저장하는 백그라운드 저장기.
+    - submit()은 bytes 복사 한 번과 put_nowait뿐이라 디코더 스레드를 막지 않음.
+    - 큐가 가득 차면 해당 access unit을 버리고, 그 드론은 다음 IDR부터 다시 저장함 (깨진 GOP를 남기지 않음).
+    '''
+    def __init__(self, directory: str, container: str = "mkv", queue_size: int = 256) -> None:
+        os.makedirs(directory, exist_ok=True)
+        self.directory = directory
+        self.container = container
+        self.queue: queue.Queue = queue.Queue(maxsize=queue_size)
+        self.writers: Dict[str, RemuxWriter] = {}
+        self.wait_idr: Dict[str, bool] = {}
+        self.dropped: Dict[str, int] = {} # 큐가 넘쳐서 저장하지 못한 access unit 수
+        self.thread = threading.Thread(target=self.writer_loop, daemon=True)
+        self.thread.start()
+
+    def submit(self, ip: str, access_unit, nal_types: Tuple[int, ...], capture_ts: float) -> None:
+        is_idr = NAL_IDR in nal_types
+        if self.wait_idr.get(ip, True):
+            if not is_idr:
+                return
+            self.wait_idr[ip] = False
+        try:
+            self.queue.put_nowait((ip, bytes(access_unit), is_idr, capture_ts)) # 파서 버퍼는 재사용되므로 복사해서 넘김
+        except queue.Full:
+            self.dropped[ip] = self.dropped.get(ip, 0) + 1
+            self.wait_idr[ip] = True
+
+    def writer_loop(self) -> None:
+        while True:
+            item = self.queue.get()
+            if item is None:
+                break
+            ip, access_unit, is_idr, capture_ts = item
+            writer = self.writers.get(ip)
+            if writer is None:
+                name = f"{ip.replace('.', '_')}_{time.strftime('%Y%m%d_%H%M%S')}.{self.container}"
+                writer = self.writers[ip] = RemuxWriter(os.path.join(self.directory, name))
+            try:
+                writer.write(access_unit, is_idr, capture_ts)
+            except Exception as e:
+                print(f"[Archive {ip} Error] {e}")
+        for writer in self.writers.values():
+            writer.close()
+
+    def close(self) -> None:
+        # 큐에 남은 access unit을 모두 쓰고 파일을 닫음
+        self.queue.put(None)
+        self.thread.join()
+
+
+class ClipBuffer:
+    '''
+    낙상 같은 이벤트가 확정됐을 때 이벤트 전 pre_seconds초와 후 post_seconds초 영상을 클립 파일로 남기기 위한 드론별 메모리 버퍼.
+    - 최근 access unit을 GOP(IDR로 시작하는 묶음) 단위로 보관하므로 클립은 항상 IDR부터 시작함.
+    - 보관량은 드론별 max_bytes와 pre_seconds로 제한되고, 넘치면 가장 오래된 GOP부터 통째로 버림.
+    - 이벤트가 끝나면(post_seconds 경과) 모은 access unit을 백그라운드 스레드에서 remux 하므로 디코더/디텍션이 막히지 않음.
+    - 스트림이 끊겨 deadline 이후 access unit이 오지 않아도 writer 스레드가 flush_grace 뒤에 모은 만큼 쓰고, close()는 모으는 중인 클립을 모두 씀.
+    '''
+    def __init__(self, directory: str, pre_seconds: float = 10.0, post_seconds: float = 5.0,
+                 max_bytes: int = 32 << 20, container: str = "mkv", flush_grace: float = 1.0) -> None:
+        os.makedirs(directory, exist_ok=True)
+        self.directory = directory
+        self.pre_seconds = pre_seconds
+        self.post_seconds = post_seconds
+        self.max_bytes = max_bytes
+        self.container = container
+        self.flush_grace = flush_grace # deadline 뒤 이만큼(초) 기다려도 access unit이 안 오면 스트림이 끊긴 것으로 보고 클립을 씀
+        self.lock = threading.Lock() # submit(디코더 스레드)과 trigger(디텍션 스레드)가 동시에 접근함
+        self.gops: Dict[str, collections.deque] = {} # ip → deque of [GOP 시작 시각, [(수신 시각, access unit, IDR 여부), ...], 바이트 수]
+        self.buffered_bytes: Dict[str, int] = {}
+        self.active: Dict[str, Dict] = {} # 이벤트 후 구간을 모으는 중인 드론 {ip: {'deadline', 'event_ts', 'aus'}}
+        self.clips_written = 0
+        self.write_queue: queue.Queue = queue.Queue()
+        self.thread = threading.Thread(target=self.writer_loop, daemon=True)
+        self.thread.start()
+
+    def submit(self, ip: str, access_unit, nal_types: Tuple[int, ...], capture_ts: float) -> None:
+        is_idr = NAL_IDR in nal_types
+        gops = self.gops.setdefault(ip, collections.deque())
+        if not is_idr and not gops: # 첫 IDR 전의 프레임은 클립에 쓸 수 없음
+            return
+        item = (capture_ts, bytes(access_unit), is_idr) # 파서 버퍼는 재사용되므로 복사해서 보관
+        with self.lock:
+            if is_idr:
+                gops.append([capture_ts, [], 0])
+            gop = gops[-1]
+            gop[1].append(item)
+            gop[2] += len(item[1])
+            self.buffered_bytes[ip] = self.buffered_bytes.get(ip, 0) + len(item[1])
+            # 남은 GOP만으로도 pre_seconds를 채우거나, 바이트 한도를 넘으면 가장 오래된 GOP를 버림 (마지막 GOP는 항상 유지)
+            while len(gops) > 1 and (self.buffered_bytes[ip] > self.max_bytes or gops[1][0] <= capture_ts - self.pre_seconds):
+                self.buffered_bytes[ip] -= gops.popleft()[2]
+            event = self.active.get(ip)
+            if event is not None:
+                event['aus'].append(item)
+                if capture_ts >= event['deadline']:
+                    del self.active[ip]
+                    self.write_queue.put((ip, event['event_ts'], event['aus']))
+
+    def trigger(self, ip: str, event_ts: float = 0.0) -> None:
+        # 이벤트 확정: 지금까지 버퍼에 있는 이전 구간을 떼어두고, post_seconds 동안 이후 구간을 이어서 모음
+        event_ts = event_ts or time.time()
+        with self.lock:
+            if ip in self.active: # 이미 클립을 모으는 중이면 이후 구간만 늘림
+                self.active[ip]['deadline'] = max(self.active[ip]['deadline'], event_ts + self.post_seconds)
+                return
+            pre_event = [item for gop in self.gops.get(ip, ()) for item in gop[1]]
+            self.active[ip] = {'deadline': event_ts + self.post_seconds, 'event_ts': event_ts, 'aus': pre_event}
+
+    def flush_expired(self, now: float) -> None:
+        # deadline이 지났는데 이후 access unit이 오지 않아 submit에서 끝나지 않은 클립을 지금까지 모은 것으로 씀
+        with self.lock:
+            for ip in [ip for ip, event in self.active.items() if now >= event['deadline'] + self.flush_grace]:
+                event = self.active.pop(ip)
+                self.write_queue.put((ip, event['event_ts'], event['aus']))
+
+    def writer_loop(self) -> None:
+        while True:
+            try:
+                item = self.write_queue.get(timeout=CLIP_FLUSH_INTERVAL)
+            except queue.Empty:
+                item = ()
+            self.flush_expired(time.time())
+            if item is None:
+                break
+            if not item:
+                continue
+            ip, event_ts, aus = item
+            name = f"clip_{ip.replace('.', '_')}_{time.strftime('%Y%m%d_%H%M%S', time.localtime(event_ts))}.{self.container}"
+            writer = RemuxWriter(os.path.join(self.directory, name))
+            try:
+                for capture_ts, access_unit, is_idr in aus:
+                    writer.write(access_unit, is_idr, capture_ts)
+                self.clips_written += 1
+                print(f"[Clip {ip}] {writer.path} ({writer.packets} frames)")
+            except Exception as e:
+                print(f"[Clip {ip} Error] {e}")
+            finally:
+                writer.close()
+
+    def close(self) -> None:
+        # 모으는 중인 클립을 지금까지 모은 것으로 모두 쓰고 writer 스레드를 끝냄
+        with self.lock:
+            events, self.active = self.active, {}
+        for ip, event in events.items():
+            self.write_queue.put((ip, event['event_ts'], event['aus']))
+        self.write_queue.put(None)
+        self.thread.join()
@@ -0,0 +1,68 @@
+from typing import Dict, Optional, Tuple
+import av
+from H264_Parser import NAL_PPS, NAL_SPS, iter_nal_units
+
+# H.264 디코더 기본 설정
+# - thread_type: "SLICE"는 프레임 지연 없이 슬라이스 단위로 병렬화, "FRAME"은 처리량은 높지만 스레드 수만큼 프레임이 늦게 나옴
+# - low_delay: 출력 재정렬 대기 없이 디코딩되는 즉시 프레임을 내보냄 (Tello 스트림은 B-프레임이 없음)
+# - skip_loop_filter: "default" | "noref" | "all" — 디블로킹 필터를 건너뛰어 CPU를 줄임 (화질 저하)
+# - skip_frame_when_behind: 패킷 큐가 behind_queue_depth 이상 밀리면 비참조 프레임 디코딩을 건너뜀
+# - restart_after_failures: 디코딩이 연속으로 이만큼 실패하면 디코더를 새로 만들고 캐시한 SPS/PPS로 다시 시작
+# - stream_gap: 데이터그램이 이 시간(초) 이상 끊겼다 들어오면 스트림 재시작(streamon/재연결)으로 보고 첫 프레임까지 시간을 잼
+DECODER_OPTIONS: Dict = {
+    'thread_type': 'SLICE',
+    'thread_count': 2,
+    'low_delay': True,
+    'skip_loop_filter': 'default',
+    'skip_frame_when_behind': True,
+    'behind_queue_depth': 32,
+    'restart_after_failures': 8,
+    'stream_gap': 1.0,
+}
+
+
+def create_decoder(options: Dict = DECODER_OPTIONS) -> av.CodecContext:
+    # 설정에 맞춘 H.264 디코더 생성 (실제로 열리는 시점은 첫 decode 호출)
+    codec = av.CodecContext.create("h264", "r")
+    codec.thread_type = options.get('thread_type', 'SLICE')
+    codec.thread_count = options.get('thread_count', 0) # 0 = FFmpeg가 코어 수에 맞춰 결정
+    av_options = {}
+    if options.get('low_delay'):
+        av_options['flags'] = '+low_delay'
+    if options.get('skip_loop_filter', 'default') != 'default':
+        av_options['skip_loop_filter'] = options['skip_loop_filter']
+    codec.options = av_options
+    return codec
+
+
+def set_behind(codec: av.CodecContext, behind: bool) -> None:
+    # 디코더가 밀렸을 때만 비참조 프레임을 건너뛰고, 따라잡으면 원래대로 돌림
+    codec.skip_frame = "NONREF" if behind else "DEFAULT"
+
+
+class ParameterSetCache:
+    '''
+    드론 한 대가 마지막으로 보낸 SPS/PPS를 보관하는 클래스.
+    - 디코더를 새로 만들었거나 재연결 후 SPS/PPS 없이 IDR이 먼저 오면, 캐시한 SPS/PPS를 앞에 붙여서 바로 디코딩을 시작함.
+    '''
+    def __init__(self) -> None:
+        self.sps: Optional[bytes] = None
+        self.pps: Optional[bytes] = None
+
+    def update(self, access_unit, nal_types: Tuple[int, ...]) -> None:
+        if NAL_SPS not in nal_types and NAL_PPS not in nal_types: # 대부분의 access unit은 여기서 끝남
+            return
+        for nal_type, nal in iter_nal_units(access_unit):
+            if nal_type == NAL_SPS:
+                self.sps = bytes(nal)
+            elif nal_type == NAL_PPS:
+                self.pps = bytes(nal)
+
+    def ready(self) -> bool:
+        return self.sps is not None and self.pps is not None
+
+    def with_parameter_sets(self, access_unit, nal_types: Tuple[int, ...]):
+        # access unit에 SPS/PPS가 없으면 캐시한 값을 앞에 붙인 bytes를, 이미 있거나 캐시가 비어 있으면 그대로 반환
+        if not self.ready() or (NAL_SPS in nal_types and NAL_PPS in nal_types):
+            return access_unit
+        return self.sps + self.pps + bytes(access_unit)
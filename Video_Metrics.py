@@ -0,0 +1,97 @@
+import bisect
+import collections
+import time
+from typing import Dict, List, Optional
+
+LATENCY_BUCKETS_MS = [1, 2, 5, 10, 20, 35, 50, 75, 100, 150, 200, 350, 500, 1000] # 지연시간 히스토그램 구간 상한(ms), 마지막 칸은 1초 초과
+
+
+class LatencyHistogram:
+    '''
+    고정 구간 지연시간 히스토그램. observe()는 bisect 한 번과 덧셈뿐이라 핫패스에서 호출해도 부담이 적음.
+    '''
+    def __init__(self, buckets_ms: List[float] = LATENCY_BUCKETS_MS) -> None:
+        self.buckets_ms = list(buckets_ms)
+        self.counts = [0] * (len(self.buckets_ms) + 1)
+        self.count = 0
+        self.total = 0.0 # 초 단위 합계
+
+    def observe(self, seconds: float) -> None:
+        self.counts[bisect.bisect_left(self.buckets_ms, seconds * 1000.0)] += 1
+        self.count += 1
+        self.total += seconds
+
+    def percentile(self, q: float) -> Optional[float]:
+        # 구간 상한으로 근사한 q 분위수(ms). 데이터가 없으면 None
+        if self.count == 0:
+            return None
+        target = q * self.count
+        seen = 0
+        for i, c in enumerate(self.counts):
+            seen += c
+            if seen >= target:
+                return self.buckets_ms[i] if i < len(self.buckets_ms) else float("inf")
+        return float("inf")
+
+    def snapshot(self) -> Dict:
+        return {
+            'count': self.count,
+            'mean_ms': self.total / self.count * 1000.0 if self.count else None,
+            'p50_ms': self.percentile(0.5),
+            'p95_ms': self.percentile(0.95),
+            'buckets_ms': self.buckets_ms,
+            'counts': list(self.counts),
+        }
+
+
+class IngestMetrics:
+    '''
+    드론 한 대의 영상 수신/디코딩 카운터.
+    - 각 카운터는 한 스레드에서만 증가시킴 (수신 스레드: datagrams/bytes/queue_drops, 디코더 스레드: 나머지).
+      GIL 아래에서 단일 작성자 += 이므로 락 없이 안전하고, snapshot()은 약간 늦은 값을 읽을 수 있을 뿐임.
+    - snapshot()은 이전 스냅샷과의 차이로 초당 값을 계산함.
+    '''
+    COUNTERS = ('datagrams', 'bytes', 'queue_drops', 'access_units', 'decode_failures', 'decoded_frames',
+                'overflows', 'skipped_frames', 'skipped_gops', 'stream_restarts', 'decoder_restarts')
+
+    def __init__(self) -> None:
+        for name in self.COUNTERS:
+            setattr(self, name, 0)
+        self.latency = LatencyHistogram() # access unit 첫 데이터그램 수신 → 디코딩 완료까지 걸린 시간
+        self.last_decode_error = ''
+        self.first_frame_times: collections.deque = collections.deque(maxlen=16) # 시작/재시작마다 첫 데이터그램 → 첫 디코딩 프레임까지 걸린 시간(초)
+        self._last_counts = {name: 0 for name in self.COUNTERS}
+        self._last_time = time.time()
+
+    def snapshot(self, queue_depth: int = 0, extra: Optional[Dict] = None) -> Dict:
+        now = time.time()
+        elapsed = max(now - self._last_time, 1e-9)
+        counts = {name: getattr(self, name) for name in self.COUNTERS}
+        snap = dict(counts)
+        snap['time'] = now
+        snap['datagrams_per_s'] = (counts['datagrams'] - self._last_counts['datagrams']) / elapsed
+        snap['bytes_per_s'] = (counts['bytes'] - self._last_counts['bytes']) / elapsed
+        snap['decoded_fps'] = (counts['decoded_frames'] - self._last_counts['decoded_frames']) / elapsed
+        snap['queue_depth'] = queue_depth
+        snap['latency'] = self.latency.snapshot()
+        snap['last_decode_error'] = self.last_decode_error
+        snap['time_to_first_frame_ms'] = [round(t * 1000.0, 1) for t in self.first_frame_times]
+        if extra:
+            snap.update(extra)
+        self._last_counts = counts
+        self._last_time = now
+        return snap
+
+
+def format_snapshot(ip: str, snap: Dict) -> str:
+    # 스냅샷 한 줄 요약 (로그 출력용)
+    latency = snap['latency']
+    p50 = latency['p50_ms']
+    p95 = latency['p95_ms']
+    ttff = snap.get('time_to_first_frame_ms')
+    return (f"[Video {ip}] {snap['datagrams_per_s']:.0f} dgram/s {snap['bytes_per_s'] / 1e3:.0f} kB/s "
+            f"q={snap['queue_depth']} drops={snap['queue_drops']} AU={snap['access_units']} "
+            f"decoded={snap['decoded_frames']} ({snap['decoded_fps']:.1f} fps) fail={snap['decode_failures']} "
+            f"skipped={snap['skipped_frames']} frames/{snap['skipped_gops']} GOPs "
+            f"latency p50={p50}ms p95={p95}ms "
+            f"restarts={snap['stream_restarts']}/{snap['decoder_restarts']} ttff={ttff[-1] if ttff else None}ms")
@@ -0,0 +1,115 @@
+import argparse
+import socket
+import struct
+import time
+from typing import Dict, Iterator, Optional, Tuple
+
+CAPTURE_MAGIC = b"TELLOCAP1\n" # 캡처 파일 시작 표시
+RECORD_HEADER = struct.Struct("<d4sH") # (수신 시각, 송신 IPv4, 데이터 길이) 14바이트 + 데이터
+
+
+class DatagramRecorder:
+    '''
+    VideoReceiver가 받은 UDP 데이터그램을 수신 시각, 송신 IP와 함께 그대로 파일에 기록하는 클래스.
+    - 비행 없이도 같은 입력으로 수신/디코딩/탐지 성능을 다시 잴 수 있도록 하기 위함.
+    - 수신 스레드 하나에서만 호출된다고 가정함 (락 없음).
+    '''
+    def __init__(self, path: str) -> None:
+        self.file = open(path, "wb", buffering=1 << 20) # 큰 버퍼로 디스크 쓰기 횟수를 줄임
+        self.file.write(CAPTURE_MAGIC)
+        self.count = 0
+
+    def write(self, arrival_ts: float, src_ip: str, data) -> None:
+        self.file.write(RECORD_HEADER.pack(arrival_ts, socket.inet_aton(src_ip), len(data)))
+        self.file.write(data)
+        self.count += 1
+
+    def close(self) -> None:
+        self.file.close()
+
+
+def read_capture(path: str) -> Iterator[Tuple[float, str, bytes]]:
+    # 캡처 파일에서 (수신 시각, 송신 IP, 데이터그램)을 순서대로 꺼냄
+    with open(path, "rb") as f:
+        if f.read(len(CAPTURE_MAGIC)) != CAPTURE_MAGIC:
+            raise ValueError(f"{path} is not a Tello datagram capture")
+        while True:
+            header = f.read(RECORD_HEADER.size)
+            if len(header) < RECORD_HEADER.size:
+                return
+            arrival_ts, packed_ip, length = RECORD_HEADER.unpack(header)
+            data = f.read(length)
+            if len(data) < length: # 녹화 도중 끊긴 마지막 레코드는 무시
+                return
+            yield arrival_ts, socket.inet_ntoa(packed_ip), data
+
+
+def loopback_sources(path: str) -> Dict[str, str]:
+    # 캡처에 나온 드론 IP마다 루프백 주소 하나씩 배정 (192.168.0.99 → 127.0.0.2, ...). 리눅스는 127.0.0.0/8 전체가 lo로 감
+    sources: Dict[str, str] = {}
+    for _, src_ip, _ in read_capture(path):
+        if src_ip not in sources:
+            sources[src_ip] = f"127.0.0.{len(sources) + 2}"
+    return sources
+
+
+def replay(path: str, host: str = "127.0.0.1", port: int = 11111, speed: float = 1.0,
+           sources: Optional[Dict[str, str]] = None, ports: Optional[Dict[str, int]] = None) -> int:
+    '''
+    캡처 파일을 다시 UDP로 보냄.
+    - speed: 1.0 = 녹화 때와 같은 간격, N = N배속, 0 = 기다리지 않고 최대 속도
+    - sources: {원래 드론 IP: 보낼 때 바인딩할 로컬 IP}. VideoReceiver는 송신 IP로 드론을 구분하므로 드론마다 다른 주소에서 보냄
+    - ports: {원래 드론 IP: 받는 포트}. 드론별 포트로 샤딩된 수신 프로세스를 재현할 때 사용
+    - return: 보낸 데이터그램 수
+    '''
+    sockets: Dict[str, socket.socket] = {}
+    sent = 0
+    start_wall = time.perf_counter()
+    start_ts = None
+    try:
+        for arrival_ts, src_ip, data in read_capture(path):
+            if start_ts is None:
+                start_ts = arrival_ts
+            if speed > 0: # 녹화된 수신 간격을 배속에 맞춰 재현
+                delay = (arrival_ts - start_ts) / speed - (time.perf_counter() - start_wall)
+                if delay > 0:
+                    time.sleep(delay)
+            sock = sockets.get(src_ip)
+            if sock is None:
+                sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+                if sources and src_ip in sources:
+                    sock.bind((sources[src_ip], 0))
+                sockets[src_ip] = sock
+            sock.sendto(data, (host, ports.get(src_ip, port) if ports else port))
+            sent += 1
+    finally:
+        for sock in sockets.values():
+            sock.close()
+    return sent
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="녹화된 Tello 영상 데이터그램을 다시 보내는 재생기")
+    parser.add_argument("capture", help="VideoReceiver(capture_path=...)로 녹화한 파일")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=11111)
+    parser.add_argument("--speed", type=float, default=1.0, help="1 = 실시간, N = N배속, 0 = 최대 속도")
+    parser.add_argument("--same-source", action="store_true", help="모든 드론의 데이터그램을 한 주소에서 보냄 (기본은 드론마다 127.0.0.x)")
+    parser.add_argument("--port-map", nargs="*", default=[], metavar="IP=PORT", help="드론별 받는 포트 (예: 192.168.0.99=11111)")
+    parser.add_argument("--loop", type=int, default=1, help="반복 재생 횟수")
+    args = parser.parse_args()
+
+    sources = None if args.same_source else loopback_sources(args.capture)
+    ports = {ip: int(p) for ip, p in (item.split("=") for item in args.port_map)}
+    if sources:
+        for src_ip, local_ip in sources.items():
+            print(f"[Replay] {src_ip} → {local_ip} (VideoReceiver에 {local_ip}를 드론 주소로 넘겨야 함)")
+    for _ in range(args.loop):
+        start = time.perf_counter()
+        sent = replay(args.capture, args.host, args.port, args.speed, sources, ports)
+        elapsed = time.perf_counter() - start
+        print(f"[Replay] sent={sent} elapsed={elapsed:.2f}s ({sent / max(elapsed, 1e-9):.0f} datagrams/s)")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,9 +1,15 @@
 from Custum_Tello import Tello
 from Get_Video import VideoReceiver
+from Debug_Viewer import DebugViewer
+from Detection_Pipeline import DetectionPipeline, format_detection_snapshot
+from Detection_Results import DetectionResultQueue, results_name
 from Mission_Command import Commander
 import multiprocessing
+import queue
 import time
 from Gcs_connector import GcsConnector
+from Video_Metrics import format_snapshot
+import threading
 from typing import Any, Dict, List, Optional, Union
 import asyncio
 from multiprocessing.sharedctypes import SynchronizedArray
@@ -91,13 +97,31 @@ import drone
 # #    main()
 
 
-def run_video_receiver(tello_ips, video_to_main_pipe) -> None:
-    vr = VideoReceiver(tello_ips, video_to_main_pipe)
+VIDEO_PORT_BASE = 11111 #드론별 영상 포트의 시작 번호 (tello0 → 11111, tello1 → 11112, ...)
+
+
+def run_video_receiver(tello_ips, video_port, result_queue_name, use_frame_ring=False, capture_path=None, metrics_queue=None, archive_dir=None, clip_dir=None, tiled_detection=False, cascade_detection=False, debug_view=False, detection_precision="auto", batch_detection=True, clip_events=None) -> None:
+    vr = VideoReceiver(tello_ips, None, video_port, use_frame_ring=use_frame_ring, capture_path=capture_path,
+                       metrics_queue=metrics_queue, archive_dir=archive_dir, clip_dir=clip_dir, tiled_detection=tiled_detection, cascade_detection=cascade_detection, debug_view=debug_view,
+                       results_name=result_queue_name, detection_precision=detection_precision, batch_detection=batch_detection, clip_events=clip_events)
     vr.vid_main()
 
 
-def run_tello_process(name : str, tello_address : str, control_port : int, tello_to_main_pipe : Any, drone_locaion_Array : SynchronizedArray, tello_location_array : SynchronizedArray) -> None:
-    tello = Tello(name, tello_address, control_port, tello_to_main_pipe,drone_locaion_Array, tello_location_array) #객체 선언
+def run_detection(tello_ips, result_queue_name, metrics_queue=None, tiled_detection=False, cascade_detection=False, debug_view=False, detection_precision="auto", batch_detection=True, clip_events=None) -> None: #공유 메모리 링에서 프레임을 읽어 탐지만 하는 프로세스
+    pipeline = DetectionPipeline(None, tello_ips, tiled=tiled_detection, cascade=cascade_detection, precision=detection_precision,
+                                 debug_viewer=DebugViewer() if debug_view else None, results=DetectionResultQueue(result_queue_name))
+    def forward_clip_event(ip, event_ts): #낙상 확정을 그 드론의 영상 프로세스로 보내서 클립을 저장하게 함 (클립 버퍼는 영상 프로세스에 있음)
+        try:
+            clip_events[ip].put_nowait((ip, event_ts))
+        except queue.Full:
+            pass
+    if clip_events:
+        pipeline.event_callbacks.append(forward_clip_event)
+    pipeline.run_frame_rings(tello_ips, batched=batch_detection, metrics_queue=metrics_queue)
+
+
+def run_tello_process(name : str, tello_address : str, control_port : int, tello_to_main_pipe : Any, drone_locaion_Array : SynchronizedArray, tello_location_array : SynchronizedArray, video_port : int) -> None:
+    tello = Tello(name, tello_address, control_port, tello_to_main_pipe,drone_locaion_Array, tello_location_array, video_port) #객체 선언
     if not tello.connect(): #tello 연결 시도
         print(f"[ERROR] 드론 연결 실패: {tello_address}")
         tello_to_main_pipe.send('f')
@@ -112,7 +136,26 @@ class Main:
         self.tello_ips : List = []
         self.main_to_tello_pipes : Dict = {}
         self.control_procs : List = []
-        self.main_to_video_pipe, self.video_to_main_pipe = multiprocessing.Pipe()
+        self.video_procs : List = []
+        self.video_ports : Dict = {name : VIDEO_PORT_BASE + i for i, name in enumerate(self.tello_info)} #드론마다 영상 포트를 하나씩 배정
+        self.video_metrics_queue = multiprocessing.Queue(maxsize=64) #영상 프로세스들이 주기적으로 보내는 수신/디코딩 지표 스냅샷
+        self.video_metrics : Dict = {} #드론 IP별 최신 영상 지표 (실행 중 조회용)
+        self.capture_dir : Optional[str] = None #경로를 주면 드론별 영상 데이터그램을 {capture_dir}/{name}.tcap 으로 녹화 (Video_Replay.py로 재생)
+        self.archive_dir : Optional[str] = None #경로를 주면 비행 영상을 재인코딩 없이 드론별 MKV로 보관
+        self.clip_dir : Optional[str] = "clips" #낙상 탐지 시 전후 영상 클립을 저장할 폴더 (None이면 사용 안 함)
+        self.batch_detection : bool = True #True면 여러 드론의 최신 프레임을 모아 YOLO 한 번으로 추론
+        #True면 디코더 프로세스는 공유 메모리 링에 프레임만 쓰고, 탐지는 별도 프로세스 하나에서 수행 (모델도 한 번만 로드)
+        #영상 프로세스는 드론마다 따로라서, 드론이 2대 이상일 때 배치 추론을 하려면 이 프로세스가 필요함
+        self.use_detection_process : bool = self.batch_detection and len(self.tello_info) > 1
+        self.tiled_detection : bool = False #True면 원본 해상도 프레임을 타일로 나눠 추가 추론 (5~6m 고도에서 작게 보이는 사람 탐지용, 추론 비용 증가)
+        self.cascade_detection : bool = False #True면 작은 사람 탐지 모델(person.pt) + 사람 crop 낙상 분류기(fall_cls.pt) 2단계로 탐지 (애매한 트랙만 다시 분류)
+        self.detection_precision : str = "auto" #"int8"이면 CPU용 INT8 양자화 모델로 탐지 (GPU 없는 노트북용. 처음 실행 때 calibration 폴더의 프레임으로 보정해서 model_cache에 저장, Model_Quantize 참고)
+        self.debug_view : bool = False #True면 탐지 결과를 그린 영상을 드론별 창으로 띄움 (디버그용, 화면이 있는 PC에서만. 탐지를 막지 않도록 별도 스레드에서 10fps 이하로 출력)
+        self.result_queues : Dict = {name : DetectionResultQueue(results_name(name), create=True) for name in self.tello_info} #드론별 영상 프로세스 → 메인 탐지 결과 레코드 큐 (공유 메모리, pickle 없이 배치로 읽음)
+        #탐지 프로세스 → 드론별 영상 프로세스로 낙상 확정 이벤트를 보내는 큐 (클립 저장용)
+        self.clip_events : Dict = {ip : multiprocessing.Queue(maxsize=16) for ip, _ in self.tello_info.values()} if self.use_detection_process and self.clip_dir else {}
+        if self.use_detection_process:
+            self.result_queues["detection"] = DetectionResultQueue(results_name("detection"), create=True) #탐지 프로세스 → 메인 탐지 결과 큐
         self.main_to_gcs_pipe, self.gcs_to_main_pipe = multiprocessing.Pipe()
         self.drone_locaion_Array : SynchronizedArray = multiprocessing.Array("d", 5, lock=True)
         self.tello_location_array : SynchronizedArray = multiprocessing.Array("f",10,lock=True)
@@ -123,12 +166,23 @@ class Main:
         with self.tello_location_array.get_lock():
             self.tello_location_array[:] = [0.0, 0.0, 0.0, 0.0, 0.0, 0.0, 0.0, 0.0, 0.0, 0.0]
             self.tello_location_array_len = len(self.tello_location_array)
-        self.gcs_connecter = GcsConnector(self.gcs_to_main_pipe, self.main_to_video_pipe, self.drone_locaion_Array, self.tello_location_array)
+        self.gcs_connecter = GcsConnector(self.gcs_to_main_pipe, list(self.result_queues.values()), self.drone_locaion_Array, self.tello_location_array)
         
         print("[INFO] GCS 연결됨")
         print("[INFO] 드론 제어 프로세스 시작됨")
         
         
+    def video_metrics_monitor(self) -> None: #영상 프로세스들의 지표 스냅샷을 받아서 최신 값으로 저장하고 출력
+        while True:
+            snapshot : Dict = self.video_metrics_queue.get()
+            for ip, snap in snapshot.items():
+                self.video_metrics.setdefault(ip, {}).update(snap) #영상 프로세스와 디텍션 프로세스가 같은 드론의 지표를 따로 보냄
+                if 'datagrams_per_s' in snap:
+                    print(format_snapshot(ip, snap))
+                if snap.get('detection'):
+                    print(format_detection_snapshot(ip, snap['detection']))
+
+
     def mission_callback(self, command : str) -> None:
         for key in self.commander.tello_command:
             self.commander.tello_command[key] = command
@@ -151,14 +205,27 @@ class Main:
                                                                           port, 
                                                                           globals()[f"tello_to_main_pipe_{ip}"],
                                                                           self.drone_locaion_Array,
-                                                                          self.tello_location_array
+                                                                          self.tello_location_array,
+                                                                          self.video_ports[name]
                                                                           )) #각각의 드론에 대해서 프로세스 실행.(만들어진 파이프, 드론 위치 배열, 락도 줌.)
             p.start() #텔로 프로세스 실행.
             self.control_procs.append(p) #컨트롤 프로세스에 해당 프로세스를 추가함
             print(f"[INFO] 드론 제어 프로세스 실행됨 → {name}")
-        video_proc = multiprocessing.Process(target=run_video_receiver, args=(self.tello_ips, self.video_to_main_pipe)) 
-        video_proc.start()
-        print("[INFO] VideoReceiver 프로세스 실행됨")
+        for (name, (ip, _)) in self.tello_info.items(): #드론마다 자기 포트를 받는 영상 수신+디코딩 프로세스를 따로 실행 (GIL을 나눠서 여러 코어 사용)
+            video_proc = multiprocessing.Process(target=run_video_receiver, args=([ip], self.video_ports[name], results_name(name), self.use_detection_process,
+                                                                                  f"{self.capture_dir}/{name}.tcap" if self.capture_dir else None,
+                                                                                  self.video_metrics_queue, self.archive_dir, self.clip_dir, self.tiled_detection, self.cascade_detection, self.debug_view, self.detection_precision,
+                                                                                  self.batch_detection, self.clip_events.get(ip)))
+            video_proc.start()
+            self.video_procs.append(video_proc)
+            print(f"[INFO] VideoReceiver 프로세스 실행됨 → {name} (port {self.video_ports[name]})")
+        if self.use_detection_process:
+            detection_proc = multiprocessing.Process(target=run_detection, args=(self.tello_ips, results_name("detection"), self.video_metrics_queue, self.tiled_detection, self.cascade_detection, self.debug_view, self.detection_precision,
+                                                                                self.batch_detection, self.clip_events))
+            detection_proc.start()
+            self.video_procs.append(detection_proc)
+            print("[INFO] Detection 프로세스 실행됨")
+        threading.Thread(target=self.video_metrics_monitor, daemon=True).start()
         for _, pipe in self.main_to_tello_pipes.items():
             re : str = pipe.recv()
             if re == 't':